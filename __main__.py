@@ -0,0 +1,7 @@
+import sys
+
+from io_scene_b3d.batch_b3d import (
+    main,
+    )
+
+sys.exit(main(sys.argv[1:]))
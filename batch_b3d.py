@@ -0,0 +1,183 @@
+# headless batch export of .blend files
+#
+#   python -m io_scene_b3d [--workers N] [--blender PATH] [--output DIR]
+#                          [--format text|binary] [--all-actions]
+#                          [--summary FILE] [--timeout SECONDS] path ...
+#
+# paths are .blend files, directories searched recursively for .blend files
+# or manifests (.txt with one path per line, .json with a list of paths).
+# every file is exported by its own `blender --background` process, with up
+# to N of them running at the same time. a failing file is reported in the
+# summary and does not stop the batch
+#
+# orchestration has no bpy dependency, worker_main runs inside Blender
+
+import os
+import sys
+import json
+import argparse
+import datetime
+import traceback
+import subprocess
+import concurrent.futures
+
+from io_scene_b3d.file_b3d import (
+    format_extensions,
+    together_models,
+    )
+
+package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+worker_expr = ("import sys; sys.path.insert(0, %r); "
+               "from io_scene_b3d.batch_b3d import worker_main; worker_main()")
+
+def collect_blends(paths):
+    blends = []
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.endswith(".blend"):
+                        blends.append(os.path.join(dirpath, filename))
+        elif path.endswith(".json"):
+            # entries are relative to the manifest, as in .txt manifests
+            with open(path, "r", encoding="utf-8") as file:
+                base = os.path.dirname(path)
+                blends.extend(collect_blends([os.path.join(base, entry) for entry in json.load(file)]))
+        elif path.endswith(".txt"):
+            with open(path, "r", encoding="utf-8") as file:
+                base = os.path.dirname(path)
+                lines = [line.strip() for line in file]
+                entries = [os.path.join(base, line) for line in lines if line and not line.startswith("#")]
+                blends.extend(collect_blends(entries))
+        else:
+            blends.append(path)
+    return blends
+
+def run_worker(blender, blend, args):
+    command = [blender, "--background", "--factory-startup", blend,
+               "--python-exit-code", "1",
+               "--python-expr", worker_expr % package_parent,
+               "--",
+               "--output", args.output,
+               "--format", args.format]
+    if args.all_actions:
+        command.append("--all-actions")
+    start_time = datetime.datetime.now()
+    result = {"file": blend}
+    try:
+        process = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                 timeout=args.timeout, encoding="utf-8", errors="replace")
+        output = process.stdout
+        result["status"] = "ok" if process.returncode == 0 else "failed"
+        result["returncode"] = process.returncode
+    except subprocess.TimeoutExpired as exception:
+        # the partial output is bytes whatever the encoding given to run
+        output = exception.output or b""
+        if isinstance(output, bytes):
+            output = output.decode("utf-8", errors="replace")
+        result["status"] = "timeout"
+    except OSError as exception:
+        output = str(exception)
+        result["status"] = "failed"
+    result["elapsed"] = (datetime.datetime.now() - start_time).total_seconds()
+    result["exported"] = [line[len("B3D exported "):] for line in output.splitlines() if line.startswith("B3D exported ")]
+    if result["status"] != "ok":
+        result["log"] = output.splitlines()[-20:]
+    return result
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m io_scene_b3d",
+                                     description="Export .blend files to .b3d with background Blender workers")
+    parser.add_argument("paths", nargs="+", help=".blend files, directories or manifests")
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) // 2),
+                        help="number of Blender processes run at the same time")
+    parser.add_argument("--blender", default=os.environ.get("BLENDER", "blender"),
+                        help="Blender executable (default $BLENDER or blender)")
+    parser.add_argument("--output", default=together_models,
+                        help="model directory, each model is written to <output>/<object>/")
+    parser.add_argument("--format", default="text", choices=("text", "binary"))
+    parser.add_argument("--all-actions", action="store_true", help="export every action to its own file")
+    parser.add_argument("--summary", help="write the summary as JSON to this file")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds allowed per file")
+    args = parser.parse_args(argv)
+
+    blends = collect_blends(args.paths)
+    start_time = datetime.datetime.now()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        futures = [executor.submit(run_worker, args.blender, blend, args) for blend in blends]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print("%-7s %8.2fs %s" % (result["status"], result["elapsed"], result["file"]))
+    results.sort(key=lambda result: result["file"])
+    elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+    failures = [result for result in results if result["status"] != "ok"]
+    summary = {
+        "files": len(results),
+        "succeeded": len(results) - len(failures),
+        "failed": len(failures),
+        "workers": args.workers,
+        "elapsed": elapsed_time,
+        "results": results,
+        }
+    print("Exported", summary["succeeded"], "of", summary["files"], "in", elapsed_time)
+    for failure in failures:
+        print("Failed", failure["file"])
+        for line in failure.get("log", []):
+            print("  " + line)
+    if args.summary:
+        with open(args.summary, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+    return 1 if failures else 0
+
+# worker, runs inside blender --background
+
+class WorkerReporter:
+    def report(self, type, message):
+        print("B3D", ", ".join(sorted(type)), message)
+
+def find_export_object(context):
+    objects = [object for object in context.scene.objects if object.type == 'MESH']
+    if context.object is not None and context.object.type == 'MESH':
+        return context.object
+    # prefer a skinned mesh
+    for object in objects:
+        if object.parent is not None and object.parent.type == 'ARMATURE':
+            return object
+    return objects[0] if objects else None
+
+def worker_main():
+    import bpy
+    from io_scene_b3d.export_b3d import export_b3d
+
+    parser = argparse.ArgumentParser(prog="io_scene_b3d worker")
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--format", default="text")
+    parser.add_argument("--all-actions", action="store_true")
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    args = parser.parse_args(argv)
+
+    try:
+        context = bpy.context
+        object = find_export_object(context)
+        if object is None:
+            raise RuntimeError("No mesh object to export in %s" % bpy.data.filepath)
+        for other in context.view_layer.objects:
+            other.select_set(False)
+        object.select_set(True)
+        context.view_layer.objects.active = object
+
+        format = args.format.upper()
+        object_base = os.path.splitext(object.name)[0]
+        dirpath = os.path.join(args.output, object_base)
+        if not os.path.exists(dirpath):
+            os.makedirs(dirpath)
+        filepath = os.path.join(dirpath, "_Idle" + format_extensions[format])
+        for path in export_b3d(WorkerReporter(), filepath, format, args.all_actions, use_cache=True):
+            print("B3D exported", path)
+    except Exception:
+        traceback.print_exc()
+        sys.exit(1)
@@ -0,0 +1,203 @@
+# synthetic .b3d generator and micro-benchmarks of the parse and serialize
+# paths, runs under plain CPython without Blender
+#
+#   python -m io_scene_b3d.bench_b3d [--vertices N] [--triangles N]
+#                                    [--materials N] [--bones N]
+#                                    [--keyframes N] [--animations N]
+#                                    [--repeat N] [--json FILE]
+#                                    [--compare FILE] [--max-regression R]
+#
+# every stage reports its best time over --repeat runs, throughput in MB/s
+# and lines/s and its peak traced memory (measured in a separate run since
+# tracemalloc slows everything down). --compare loads the JSON of an earlier
+# run and fails when a stage got slower by more than --max-regression
+
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import datetime
+import tracemalloc
+
+from io_scene_b3d.model_b3d import (
+    B3DAnimation,
+    B3DModel,
+    B3DTrack,
+    )
+from io_scene_b3d.parse_b3d import (
+    load_b3d,
+    )
+from io_scene_b3d.parallel_b3d import (
+    load_b3d_parallel,
+    )
+from io_scene_b3d.write_b3d import (
+    save_b3d,
+    serialize_sections,
+    )
+from io_scene_b3d.binary_b3d import (
+    load_b3db,
+    save_b3db,
+    )
+
+def generate_model(vertices=10000, triangles=20000, materials=2, bones=30, keyframes=100, animations=1, seed=0):
+    rand = random.Random(seed)
+    uniform = rand.uniform
+    model = B3DModel("Synthetic")
+    model.fps = 30.
+    model.frame_start = 0.
+    model.frame_end = float(max(keyframes - 1, 0))
+    model.frame_current = 0.
+    model.positions = [uniform(-10., 10.) for n in range(vertices * 3)]
+    model.normals = [uniform(-1., 1.) for n in range(vertices * 3)]
+    model.vertex_bones = [rand.randrange(-1, bones) for n in range(vertices)] if bones else [-1] * vertices
+    model.triangles = [rand.randrange(vertices) for n in range(triangles * 3)] if vertices else []
+    model.triangle_materials = [rand.randrange(materials) for n in range(triangles)] if materials else [-1] * triangles
+    model.uvs = [rand.random() for n in range(triangles * 6)]
+    model.materials = [("Material_%i" % n, "Texture_%i.png" % n) for n in range(materials)]
+    for n in range(bones):
+        model.bone_names.append("Bone_%i" % n)
+        model.bone_parents.append("" if n == 0 else "Bone_%i" % rand.randrange(n))
+        model.bone_transforms.extend([uniform(-1., 1.) for k in range(6)] + [1.])
+    for a in range(animations):
+        animation = B3DAnimation("Animation_%i" % a)
+        for n in range(bones):
+            track = B3DTrack("Bone_%i" % n)
+            for k in range(keyframes):
+                track.locations.extend((float(k), uniform(-1., 1.), uniform(-1., 1.), uniform(-1., 1.)))
+                track.rotations.extend((float(k), uniform(-3., 3.), uniform(-3., 3.), uniform(-3., 3.)))
+            animation.tracks.append(track)
+        model.animations.append(animation)
+    return model
+
+def time_stage(function, repeat):
+    best = None
+    for n in range(repeat):
+        start_time = datetime.datetime.now()
+        function()
+        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+        best = elapsed_time if best is None else min(best, elapsed_time)
+    return best
+
+def peak_memory(function):
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def run_benchmarks(model, repeat=3):
+    directory = tempfile.mkdtemp(prefix="bench_b3d")
+    text_path = os.path.join(directory, "bench.b3d")
+    binary_path = os.path.join(directory, "bench.b3db")
+    try:
+        save_b3d(text_path, model)
+        save_b3db(binary_path, model)
+        text_size = os.path.getsize(text_path)
+        binary_size = os.path.getsize(binary_path)
+        with open(text_path, "rb") as file:
+            lines = file.read().count(b"\n")
+
+        def touch_binary():
+            # force a read of every mapped page
+            loaded = load_b3db(binary_path)
+            sum(loaded.positions) + sum(loaded.uvs)
+
+        stages = [
+            ("serialize", lambda: "".join(serialize_sections(model)), text_size, lines),
+            ("write", lambda: save_b3d(text_path, model), text_size, lines),
+            ("parse", lambda: load_b3d(text_path), text_size, lines),
+            ("parse_parallel", lambda: load_b3d_parallel(text_path, threshold=0), text_size, lines),
+            ("write_binary", lambda: save_b3db(binary_path, model), binary_size, None),
+            ("read_binary", touch_binary, binary_size, None),
+            ]
+        results = {}
+        for name, function, size, count in stages:
+            seconds = time_stage(function, repeat)
+            result = {
+                "seconds": seconds,
+                "bytes": size,
+                "mb_per_s": size / 1e6 / max(seconds, 1e-9),
+                "peak_memory": peak_memory(function),
+                }
+            if count is not None:
+                result["lines"] = count
+                result["lines_per_s"] = count / max(seconds, 1e-9)
+            results[name] = result
+        return results
+    finally:
+        for path in (text_path, binary_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(directory)
+
+def compare_results(results, baseline, max_regression):
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        ratio = result["seconds"] / max(reference["seconds"], 1e-9)
+        print("%-14s %8.4fs vs %8.4fs  x%.2f" % (name, result["seconds"], reference["seconds"], ratio))
+        if ratio > 1. + max_regression:
+            regressions.append(name)
+    return regressions
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m io_scene_b3d.bench_b3d",
+                                     description="Benchmark .b3d parse and serialize on synthetic data")
+    parser.add_argument("--vertices", type=int, default=50000)
+    parser.add_argument("--triangles", type=int, default=100000)
+    parser.add_argument("--materials", type=int, default=4)
+    parser.add_argument("--bones", type=int, default=60)
+    parser.add_argument("--keyframes", type=int, default=500)
+    parser.add_argument("--animations", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="allowed slowdown against --compare, 0.2 is 20%%")
+    args = parser.parse_args(argv)
+
+    config = {
+        "vertices": args.vertices,
+        "triangles": args.triangles,
+        "materials": args.materials,
+        "bones": args.bones,
+        "keyframes": args.keyframes,
+        "animations": args.animations,
+        "seed": args.seed,
+        "repeat": args.repeat,
+        }
+    model = generate_model(args.vertices, args.triangles, args.materials, args.bones,
+                           args.keyframes, args.animations, args.seed)
+    results = run_benchmarks(model, args.repeat)
+    report = {
+        "config": config,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+        }
+    for name, result in results.items():
+        print("%-14s %8.4fs %8.1f MB/s %12s lines/s %8.1f MB peak" %
+              (name, result["seconds"], result["mb_per_s"],
+               "%.0f" % result["lines_per_s"] if "lines_per_s" in result else "-",
+               result["peak_memory"] / 1e6))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_results(results, baseline, args.max_regression)
+        if regressions:
+            print("Regressed:", ", ".join(regressions))
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
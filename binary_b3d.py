@@ -0,0 +1,226 @@
+# binary sibling of the text .b3d format (.b3db)
+#
+# layout, all little-endian
+#   header   magic "B3DB", version u16, section count u16, reserved u32
+#   toc      per section: tag 4s, type c, width u8, reserved u16,
+#            count u32, offset u64, size u64
+#   data     one section per column, each aligned on 8 bytes
+#
+# section types
+#   f  float32 array, count rows of width values
+#   i  int32 array, count rows of width values
+#   d  float64 array, count rows of width values
+#   s  count utf-8 strings, each terminated by a zero byte
+#
+# numeric sections are fixed-stride arrays so a reader can mmap the file
+# and view them with memoryview.cast without copying. keyframes of all
+# tracks are stored back to back in KEYS, KIDX holds the first key, the
+# number of locations and the number of rotations of each track and ATRK
+# the number of tracks of each animation
+
+import os
+import sys
+import mmap
+import struct
+
+from array import array
+
+from io_scene_b3d.model_b3d import (
+    B3DAnimation,
+    B3DModel,
+    B3DTrack,
+    )
+from io_scene_b3d.compress_b3d import (
+    default_level,
+    file_compression,
+    open_b3d,
+    )
+
+magic = b"B3DB"
+version = 1
+
+header_struct = struct.Struct("<4sHHI")
+entry_struct = struct.Struct("<4scBHIQQ")
+
+alignment = 8
+
+little_endian = sys.byteorder == 'little'
+
+def is_b3db(b3d):
+    with open_b3d(b3d, "rb") as file:
+        return file.read(len(magic)) == magic
+
+def pack_strings(strings):
+    return b"".join(string.encode("utf-8") + b"\0" for string in strings)
+
+def unpack_strings(data, count):
+    if count == 0:
+        return []
+    strings = bytes(data).split(b"\0")[:count]
+    return [string.decode("utf-8") for string in strings]
+
+def mesh_sections(model):
+    # (tag, type, width, values)
+    return [
+        (b"NAME", b"s", 1, [model.name]),
+        (b"HEAD", b"d", 4, [model.fps, model.frame_start, model.frame_end, model.frame_current]),
+        (b"VPOS", b"f", 3, model.positions),
+        (b"VNRM", b"f", 3, model.normals),
+        (b"VBON", b"i", 1, model.vertex_bones),
+        (b"TIDX", b"i", 3, model.triangles),
+        (b"TMAT", b"i", 1, model.triangle_materials),
+        (b"TUVS", b"f", 6, model.uvs),
+        ]
+
+def material_sections(model):
+    return [
+        (b"MATN", b"s", 1, [material[0] for material in model.materials]),
+        (b"MATT", b"s", 1, [material[1] for material in model.materials]),
+        ]
+
+def skeleton_sections(model):
+    return [
+        (b"BNAM", b"s", 1, model.bone_names),
+        (b"BPAR", b"s", 1, model.bone_parents),
+        (b"BXFM", b"f", 7, model.bone_transforms),
+        ]
+
+def static_sections(model):
+    # every section but the animations
+    return mesh_sections(model) + material_sections(model) + skeleton_sections(model)
+
+def animation_sections(model):
+    animation_tracks = array('i')
+    track_names = []
+    track_index = array('i')
+    keys = array('f')
+    for animation in model.animations:
+        animation_tracks.append(len(animation.tracks))
+        for track in animation.tracks:
+            track_names.append(track.bone_name)
+            track_index.append(len(keys) // 4)
+            track_index.append(len(track.locations) // 4)
+            keys.extend(array('f', track.locations))
+            track_index.append(len(track.rotations) // 4)
+            keys.extend(array('f', track.rotations))
+    return [
+        (b"ANAM", b"s", 1, [animation.name for animation in model.animations]),
+        (b"ATRK", b"i", 1, animation_tracks),
+        (b"TNAM", b"s", 1, track_names),
+        (b"KIDX", b"i", 3, track_index),
+        (b"KEYS", b"f", 4, keys),
+        ]
+
+def pack_section(kind, values):
+    if kind == b"s":
+        return pack_strings(values)
+    data = array(kind.decode("ascii"), values)
+    if not little_endian:
+        data.byteswap()
+    return data.tobytes()
+
+def pack_sections(sections):
+    # (tag, type, width, count, payload)
+    packed = []
+    for tag, kind, width, values in sections:
+        count = len(values) if kind == b"s" else len(values) // width
+        packed.append((tag, kind, width, count, pack_section(kind, values)))
+    return packed
+
+def write_packed(file, packed):
+    position = header_struct.size + entry_struct.size * len(packed)
+    offset = position
+    entries = []
+    for tag, kind, width, count, payload in packed:
+        offset += -offset % alignment
+        entries.append(entry_struct.pack(tag, kind, width, 0, count, offset, len(payload)))
+        offset += len(payload)
+    file.write(header_struct.pack(magic, version, len(packed), 0))
+    for entry in entries:
+        file.write(entry)
+    for tag, kind, width, count, payload in packed:
+        padding = -position % alignment
+        file.write(b"\0" * padding)
+        file.write(payload)
+        position += padding + len(payload)
+
+def write_b3db(file, model):
+    write_packed(file, pack_sections(static_sections(model) + animation_sections(model)))
+
+def save_b3db(b3d, model, level=default_level):
+    with open_b3d(b3d, "wb", level) as file:
+        write_b3db(file, model)
+
+def read_toc(buffer):
+    tag, version_read, num_sections, reserved = header_struct.unpack_from(buffer, 0)
+    if tag != magic:
+        raise ValueError("Not a .b3db file")
+    if version_read > version:
+        raise ValueError("Unsupported .b3db version %i" % version_read)
+    toc = {}
+    for n in range(num_sections):
+        tag, kind, width, reserved, count, offset, size = entry_struct.unpack_from(buffer, header_struct.size + entry_struct.size * n)
+        toc[tag] = (kind, width, count, offset, size)
+    return toc
+
+def view_section(buffer, toc, tag):
+    kind, width, count, offset, size = toc[tag]
+    data = memoryview(buffer)[offset:offset + size]
+    if kind == b"s":
+        return unpack_strings(data, count)
+    code = kind.decode("ascii")
+    if little_endian:
+        # zero copy view into the mapped file
+        return data.cast(code)
+    values = array(code, data.tobytes())
+    values.byteswap()
+    return values
+
+def read_b3db(buffer):
+    toc = read_toc(buffer)
+
+    def section(tag):
+        return view_section(buffer, toc, tag)
+
+    model = B3DModel(section(b"NAME")[0])
+    model.fps, model.frame_start, model.frame_end, model.frame_current = section(b"HEAD")
+    model.positions = section(b"VPOS")
+    model.normals = section(b"VNRM")
+    model.vertex_bones = section(b"VBON")
+    model.triangles = section(b"TIDX")
+    model.triangle_materials = section(b"TMAT")
+    model.uvs = section(b"TUVS")
+    model.materials = list(zip(section(b"MATN"), section(b"MATT")))
+    model.bone_names = section(b"BNAM")
+    model.bone_parents = section(b"BPAR")
+    model.bone_transforms = section(b"BXFM")
+    animation_tracks = section(b"ATRK")
+    track_names = section(b"TNAM")
+    track_index = section(b"KIDX")
+    keys = section(b"KEYS")
+    n = 0
+    for animation_name, num_tracks in zip(section(b"ANAM"), animation_tracks):
+        animation = B3DAnimation(animation_name)
+        for i in range(num_tracks):
+            first = track_index[n * 3] * 4
+            num_locations = track_index[n * 3 + 1] * 4
+            num_rotations = track_index[n * 3 + 2] * 4
+            animation.tracks.append(B3DTrack(track_names[n],
+                                             keys[first:first + num_locations],
+                                             keys[first + num_locations:first + num_locations + num_rotations]))
+            n += 1
+        model.animations.append(animation)
+    return model
+
+def load_b3db(b3d):
+    if file_compression(b3d) != 'NONE':
+        # a compressed file cannot be mapped, it is decompressed in memory
+        with open_b3d(b3d, "rb") as file:
+            return read_b3db(file.read())
+    with open(b3d, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError("Not a .b3db file")
+        # the returned arrays are views into the mapping which stays alive
+        # as long as any of them is referenced
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    return read_b3db(buffer)
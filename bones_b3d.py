@@ -0,0 +1,104 @@
+# bone bookkeeping shared by export_b3d and describe_b3d
+#
+# lookups are done through tables built once per export instead of
+# searching the bones for every vertex and every fcurve. given a Stats, the
+# functions count their accesses to Blender as rna_calls
+
+import re
+
+# pose.bones["name"] with the name escaped as in bpy.utils.escape_identifier
+bone_data_path = re.compile(r'pose\.bones\["((?:[^"\\]|\\.)*)"\]')
+bone_name_escape = re.compile(r'\\(.)')
+
+class BoneExport:
+    # keys by time while the fcurves are merged, build_animation turns them
+    # into the array columns of a B3DTrack
+    __slots__ = ("prefix", "bone", "locations", "euler_rotations", "quaternion_rotations")
+
+    def __init__(self, prefix, bone):
+        self.prefix = prefix
+        self.bone = bone
+        self.locations = {}
+        self.euler_rotations = {}
+        self.quaternion_rotations = {}
+
+    def __repr__(self):
+        return "BoneExport(%s)" % self.prefix
+
+def collect_boneexports(armature, stats=None):
+    boneexports = []
+    for bone in armature.data.bones:
+        prefix = 'pose.bones["%s"]' % bone.name
+        boneexport = BoneExport(prefix, bone)
+        boneexports.append(boneexport)
+    if stats is not None:
+        stats.count("rna_calls", 2 + len(boneexports) * 2)
+    return boneexports
+
+def index_boneexports(boneexports, stats=None):
+    if stats is not None:
+        stats.count("rna_calls", len(boneexports))
+    return {boneexport.bone.name: boneexport for boneexport in boneexports}
+
+def data_path_bone_name(data_path):
+    match = bone_data_path.match(data_path)
+    if match is None:
+        return None
+    return bone_name_escape.sub(r'\1', match.group(1))
+
+def find_boneexport(boneexports_index, data_path):
+    name = data_path_bone_name(data_path)
+    if name is None:
+        return None
+    return boneexports_index.get(name)
+
+def vertex_group_bones(object, armature, stats=None):
+    # bone index of each vertex group, -1 when no bone has its name
+    if not armature or armature.type != 'ARMATURE':
+        group_bones = [-1] * len(object.vertex_groups)
+        num_calls = 3 if armature else 2
+    else:
+        bones = armature.data.bones
+        group_bones = [bones.find(group.name) for group in object.vertex_groups]
+        num_calls = 4 + len(group_bones) * 3
+    if stats is not None:
+        stats.count("rna_calls", num_calls)
+    return group_bones
+
+def collect_keyframes(action, boneexports_index, stats=None):
+    # fills the per time dicts of the boneexports and returns the data paths
+    # of the fcurves that do not animate a bone
+    unresolved = []
+    num_calls = 1
+    for fcurve in action.fcurves:
+        data_path = fcurve.data_path
+        num_calls += 2
+        boneexport = find_boneexport(boneexports_index, data_path)
+        if boneexport is None:
+            unresolved.append(data_path)
+            continue
+        dict = None
+        if data_path.endswith("location"):
+            dict = boneexport.locations
+            size = 3
+        elif data_path.endswith("rotation_euler"):
+            dict = boneexport.euler_rotations
+            size = 3
+        elif data_path.endswith("rotation_quaternion"):
+            dict = boneexport.quaternion_rotations
+            size = 4
+        if dict is not None:
+            index = fcurve.array_index
+            num_calls += 2
+            for keyframe in fcurve.keyframe_points:
+                # the element and its co
+                num_calls += 2
+                time, value = keyframe.co
+                entry = dict.get(time)
+                if entry is None:
+                    entry = [0.] * size
+                    dict[time] = entry
+                entry[index] = value
+    if stats is not None:
+        stats.count("rna_calls", num_calls)
+    return unresolved
@@ -0,0 +1,152 @@
+# content-hash cache for exports
+#
+# the cache lives in the target model directory (.b3dcache.json) and keeps
+#   chunks: serialized sections by key with the digest of their inputs
+#   files: the digest, size and mtime of every file written
+#
+# a chunk whose digest did not change is reused as is and a file whose
+# digest, size and mtime did not change is not rewritten at all, so its
+# mtime is preserved. chunks are evicted least recently used first once
+# their total size goes over max_size. the cache file itself is only
+# written when a chunk or file changed, an export with nothing to do
+# leaves the directory untouched
+
+import os
+import json
+import base64
+import hashlib
+
+from array import array
+
+cache_filename = ".b3dcache.json"
+cache_version = 1
+
+default_max_size = 64 * 1024 * 1024
+
+def hash_values(*values):
+    hasher = hashlib.blake2b(digest_size=16)
+    for value in values:
+        if isinstance(value, str):
+            data = value.encode("utf-8")
+        elif isinstance(value, (bytes, bytearray)):
+            data = value
+        elif isinstance(value, (array, memoryview)):
+            data = value.tobytes()
+        elif isinstance(value, (int, float)):
+            data = repr(value).encode("ascii")
+        else:
+            try:
+                data = array('d', value).tobytes()
+            except TypeError:
+                data = repr(value).encode("utf-8")
+        hasher.update(len(data).to_bytes(8, 'little'))
+        hasher.update(data)
+    return hasher.hexdigest()
+
+def encode_chunk(chunk):
+    if isinstance(chunk, str):
+        return {"text": chunk}, len(chunk)
+    packed = [[tag.decode("ascii"), kind.decode("ascii"), width, count, base64.b64encode(payload).decode("ascii")]
+              for tag, kind, width, count, payload in chunk]
+    return {"packed": packed}, sum(len(section[4]) for section in packed)
+
+def decode_chunk(entry):
+    if "text" in entry:
+        return entry["text"]
+    return [(tag.encode("ascii"), kind.encode("ascii"), width, count, base64.b64decode(payload))
+            for tag, kind, width, count, payload in entry["packed"]]
+
+class ExportCache:
+    def __init__(self, directory=None, max_size=default_max_size):
+        # a cache without a directory is disabled and always rebuilds
+        self.path = None if directory is None else os.path.join(directory, cache_filename)
+        self.max_size = max_size
+        self.chunks = {}
+        self.files = {}
+        self.clock = 0
+        self.hits = 0
+        self.misses = 0
+        self.dirty = False
+        if self.path is not None:
+            self.load()
+
+    def __repr__(self):
+        return "ExportCache(%s)" % self.path
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get("version") != cache_version:
+            return
+        self.chunks = data.get("chunks", {})
+        self.files = data.get("files", {})
+        self.clock = data.get("clock", 0)
+
+    def save(self):
+        self.evict()
+        if self.path is None or not self.dirty:
+            return
+        data = {
+            "version": cache_version,
+            "clock": self.clock + 1,
+            "chunks": self.chunks,
+            "files": self.files,
+            }
+        temporary = self.path + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(data, file)
+        os.replace(temporary, self.path)
+        self.dirty = False
+
+    def invalidate(self):
+        self.chunks.clear()
+        self.files.clear()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def evict(self):
+        total = sum(entry["size"] for entry in self.chunks.values())
+        if total <= self.max_size:
+            return
+        for key in sorted(self.chunks, key=lambda key: self.chunks[key]["used"]):
+            total -= self.chunks.pop(key)["size"]
+            self.dirty = True
+            if total <= self.max_size:
+                break
+
+    def chunk(self, key, digest, build):
+        entry = self.chunks.get(key)
+        if entry is not None and entry["digest"] == digest:
+            entry["used"] = self.clock
+            self.hits += 1
+            return decode_chunk(entry)
+        self.misses += 1
+        chunk = build()
+        if self.path is not None:
+            encoded, size = encode_chunk(chunk)
+            encoded.update(digest=digest, size=size, used=self.clock)
+            self.chunks[key] = encoded
+            self.dirty = True
+        return chunk
+
+    def file_unchanged(self, filepath, digest):
+        if self.path is None:
+            return False
+        record = self.files.get(os.path.basename(filepath))
+        if record is None or record["digest"] != digest:
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        return stat.st_size == record["size"] and stat.st_mtime_ns == record["mtime"]
+
+    def record_file(self, filepath, digest):
+        if self.path is None:
+            return
+        stat = os.stat(filepath)
+        self.files[os.path.basename(filepath)] = {"digest": digest, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+        self.dirty = True
@@ -0,0 +1,49 @@
+# transparent gzip and xz compression of .b3d and .b3db files
+#
+# a file ending in .gz or .xz is compressed, the rest of the name tells
+# the format as usual (_Idle.b3d.gz, _Idle.b3db.xz). reading and writing
+# stream through the compressor so the file is never held in memory whole
+
+import os
+import gzip
+import lzma
+
+compression_extensions = {
+    'NONE': "",
+    'GZIP': ".gz",
+    'XZ': ".xz",
+    }
+
+default_level = 6
+
+def file_compression(b3d):
+    extension = os.path.splitext(b3d)[1].lower()
+    for compression, compression_extension in compression_extensions.items():
+        if compression_extension and extension == compression_extension:
+            return compression
+    return 'NONE'
+
+def strip_compression(b3d):
+    if file_compression(b3d) != 'NONE':
+        return os.path.splitext(b3d)[0]
+    return b3d
+
+def open_b3d(b3d, mode="r", level=default_level):
+    # mode is "r", "w", "rb" or "wb", text is utf-8 with \n line endings
+    compression = file_compression(b3d)
+    binary = "b" in mode
+    if compression == 'NONE':
+        if binary:
+            return open(b3d, mode)
+        return open(b3d, mode, encoding="utf-8", newline="\n")
+    if not binary:
+        mode = mode + "t"
+    text_options = {} if binary else {"encoding": "utf-8", "newline": "\n"}
+    if compression == 'GZIP':
+        if "w" in mode:
+            return gzip.open(b3d, mode, compresslevel=level, **text_options)
+        return gzip.open(b3d, mode, **text_options)
+    else:
+        if "w" in mode:
+            return lzma.open(b3d, mode, preset=level, **text_options)
+        return lzma.open(b3d, mode, **text_options)
@@ -0,0 +1,87 @@
+# text <-> binary .b3d converter that runs without Blender
+#
+#   python -m io_scene_b3d.convert_b3d [--check] [--to text|binary] path ...
+#
+# files are converted next to their source, directories are walked and
+# every file of the other format is converted. --check reads the result
+# back and compares it to the source within float32 precision
+
+import os
+import sys
+import datetime
+
+from io_scene_b3d.model_b3d import (
+    compare_models,
+    )
+from io_scene_b3d.file_b3d import (
+    detect_format,
+    format_extensions,
+    load_model,
+    replace_extension,
+    save_model,
+    )
+from io_scene_b3d.compress_b3d import (
+    strip_compression,
+    )
+
+# float32 keeps about 7 significant digits and the text format 6 decimals
+check_tolerance = 1e-6
+
+def convert_file(source, target_format=None, check=False):
+    source_format = detect_format(source)
+    if target_format is None:
+        target_format = 'TEXT' if source_format == 'BINARY' else 'BINARY'
+    target = replace_extension(source, target_format)
+    if target == source:
+        raise ValueError("Source and target are the same file: %s" % source)
+    model = load_model(source, source_format)
+    save_model(target, model, target_format)
+    mismatch = None
+    if check:
+        mismatch = compare_models(model, load_model(target, target_format), check_tolerance)
+    return target, mismatch
+
+def collect_files(paths, target_format):
+    source_extension = format_extensions['TEXT' if target_format == 'BINARY' else 'BINARY']
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if strip_compression(filename).endswith(source_extension):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+def main(argv):
+    check = False
+    target_format = None
+    paths = []
+    args = iter(argv)
+    for arg in args:
+        if arg == "--check":
+            check = True
+        elif arg == "--to":
+            target_format = next(args, "").upper()
+            if target_format not in format_extensions:
+                print("--to expects text or binary")
+                return 2
+        else:
+            paths.append(arg)
+    if not paths:
+        print("usage: python -m io_scene_b3d.convert_b3d [--check] [--to text|binary] path ...")
+        return 2
+    # directories default to migrating text files to binary
+    status = 0
+    for source in collect_files(paths, target_format or 'BINARY'):
+        start_time = datetime.datetime.now()
+        target, mismatch = convert_file(source, target_format, check)
+        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+        print("Converted", source, "to", target, "in", elapsed_time)
+        if mismatch is not None:
+            print("Round-trip mismatch in", mismatch)
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -5,6 +5,13 @@ import sys
 import math
 import mathutils
 
+from io_scene_b3d.bones_b3d import (
+    collect_boneexports,
+    collect_keyframes,
+    index_boneexports,
+    vertex_group_bones,
+    )
+
 def describe():
     def format(str):
         sys.stdout.write(str)
@@ -25,14 +32,6 @@ def describe():
         target_frames = (0., 50., 100.)
     
     if object.type == 'MESH':
-        def mesh_triangulate(me):
-            import bmesh
-            bm = bmesh.new()
-            bm.from_mesh(me)
-            bmesh.ops.triangulate(bm, faces=bm.faces)
-            bm.to_mesh(me)
-            bm.free()
-        
         print()
         print()
         print()
@@ -48,12 +47,15 @@ def describe():
         print(object.matrix_local)
         print(object.matrix_basis)
         
+        # the loop triangles are computed on the side, the mesh itself is
+        # left as it is
         mesh = object.data
-        mesh_triangulate(mesh)
+        mesh.calc_loop_triangles()
         
         # vertices
         format("\nVERTICES %i\n" % len(mesh.vertices))
         matrix_basis = object.matrix_basis
+        group_bones = vertex_group_bones(object, armature)
         for rank, vert in enumerate(mesh.vertices):
             if rank < target_vertices:
                 group = -1
@@ -65,21 +67,21 @@ def describe():
                 co = matrix_basis @ vert.co
                 index = -1
                 if group != -1:
-                    name = object.vertex_groups[group].name
-                    index = armature.data.bones.find(name)
+                    index = group_bones[group]
                 format("%.6f, %.6f, %.6f, %i\n" % (co.x, co.y, co.z, index))
         
         # triangles
-        format("\nTRIANGLES %i\n" % len(mesh.polygons))
+        format("\nTRIANGLES %i\n" % len(mesh.loop_triangles))
         uv_loops = mesh.uv_layers.active.data
-        for rank, poly in enumerate(mesh.polygons):
+        for rank, tri in enumerate(mesh.loop_triangles):
             if rank < target_triangles:
-                v1, v2, v3 = poly.vertices
-                n = poly.normal
-                mat = poly.material_index
-                uv1 = uv_loops[poly.loop_start].uv
-                uv2 = uv_loops[poly.loop_start + 1].uv
-                uv3 = uv_loops[poly.loop_start + 2].uv
+                v1, v2, v3 = tri.vertices
+                n = tri.normal
+                mat = tri.material_index
+                l1, l2, l3 = tri.loops
+                uv1 = uv_loops[l1].uv
+                uv2 = uv_loops[l2].uv
+                uv3 = uv_loops[l3].uv
                 format("%i, %i, %i, %.3f, %.3f, %.3f, %i, %.3f, %.3f, %.3f, %.3f, %.3f, %.3f\n" %
                     (v1, v2, v3, n.x, n.y, n.z, mat, uv1[0], 1.0 - uv1[1], uv2[0], 1.0 - uv2[1], uv3[0], 1.0 - uv3[1]))
         
@@ -95,37 +97,6 @@ def describe():
                         format('"%s", "%s"\n' % (material_slot.name, filename))
         
         if armature.type == 'ARMATURE':
-            class BoneExport:
-                def __init__(self, prefix, bone):
-                    self.prefix = prefix
-                    self.bone = bone
-                    self.locations = {}
-                    self.euler_rotations = {}
-                    self.quaternion_rotations = {}
-                
-                def __repr__(self):
-                    return "BoneExport(%s)" % self.prefix
-            
-            def collect_boneexports():
-                boneexports = []
-                for bone in armature.data.bones:
-                    prefix = 'pose.bones["%s"]' % bone.name
-                    boneexport = BoneExport(prefix, bone)
-                    boneexports.append(boneexport)
-                return boneexports
-            
-            def get_boneexport(name):
-                for boneexport in boneexports:
-                    if boneexport.name == name:
-                        return boneexport
-                return None
-            
-            def find_boneexport(data_path):
-                for idx, boneexport in enumerate(boneexports):
-                    if data_path.startswith(boneexport.prefix):
-                        return boneexport
-                return None
-            
             # bones
             def compute_matrix(bone):
                 parent_bone = bone.parent
@@ -134,7 +105,7 @@ def describe():
                 else:
                     return parent_bone.matrix_local.inverted() @ bone.matrix_local
             
-            boneexports = collect_boneexports()
+            boneexports = collect_boneexports(armature)
             format("\nBONES %i\n" % len(boneexports))
             for boneexport in boneexports:
                 bone = boneexport.bone
@@ -158,38 +129,10 @@ def describe():
                 return
             if action is not None:
                 format('"%s"\n' % action.name)
-                for fcurve in action.fcurves:
-                    data_path = fcurve.data_path
-                    boneexport = find_boneexport(data_path)
-                    if boneexport is None:
-                        print("***** FCURVE NOT FOUND", data_path)
-                        return
-                    dict = None
-                    if data_path.endswith("location"):
-                        dict = boneexport.locations
-                        kind = 'location'
-                    elif data_path.endswith("rotation_euler"):
-                        dict = boneexport.euler_rotations
-                        kind = 'euler_rotation'
-                    elif data_path.endswith("rotation_quaternion"):
-                        dict = boneexport.quaternion_rotations
-                        kind = 'quaternion_rotation'
-                    if dict is not None:
-                        for keyframe in fcurve.keyframe_points:
-                            time = keyframe.co[0]
-                            value = keyframe.co[1]
-                            entry = dict.get(time)
-                            if entry is None:
-                                if kind == 'location':
-                                    entry = [0., 0., 0.]
-                                    dict[time] = entry
-                                elif kind == 'euler_rotation':
-                                    entry = [0., 0., 0.]
-                                    dict[time] = entry
-                                elif kind == 'quaternion_rotation':
-                                    entry = [0., 0., 0., 0.]
-                                    dict[time] = entry
-                            entry[fcurve.array_index] = value
+                unresolved = collect_keyframes(action, index_boneexports(boneexports))
+                if unresolved:
+                    print("***** FCURVE NOT FOUND", unresolved[0])
+                    return
             for boneexport in boneexports:
                 bone = boneexport.bone
                 if target_bones is None or bone.name in target_bones:
@@ -0,0 +1,387 @@
+# tolerance aware comparison of two .b3d files, section by section, that
+# runs without Blender
+#
+#   python -m io_scene_b3d.diff_b3d [--tolerance 1e-5] [--angle-tolerance 1e-4]
+#                                   [--max-mismatches 10] [--json] a b
+#
+# both files are streamed as groups of rows (a section, or a keyframe run
+# of an animation track) read in blocks, so memory stays constant whatever
+# the size of the files. text and binary files can be mixed. blocks of
+# text lines that are byte identical are not converted at all, the others
+# are compared column by column: names and indices exactly, floats within
+# the absolute tolerance and euler angles and normals within the angular
+# tolerance in radians. the first mismatches of every section are listed
+# with the maximum and mean errors. when a and b are directories the files
+# with the same relative path are compared. the exit code is 1 when the
+# files differ
+
+import os
+import sys
+import json
+import math
+import argparse
+import datetime
+
+from array import array
+from itertools import zip_longest
+
+from io_scene_b3d.model_b3d import (
+    column_converters,
+    column_typecodes,
+    )
+from io_scene_b3d.parse_b3d import (
+    parse_line,
+    split_tokens,
+    )
+from io_scene_b3d.binary_b3d import (
+    is_b3db,
+    load_b3db,
+    )
+from io_scene_b3d.compress_b3d import (
+    open_b3d,
+    strip_compression,
+    )
+from io_scene_b3d.file_b3d import (
+    format_extensions,
+    )
+
+default_tolerance = 1e-5
+default_angle_tolerance = 1e-4
+default_max_mismatches = 10
+
+block_rows = 16384
+
+# columns of every kind of group, s strings and i integers are compared
+# exactly, f floats by absolute difference, a angles by their difference
+# wrapped to [-pi, pi] and n normals by the angle between the vectors
+layouts = {
+    "OBJECT": (("name", "s"), ("fps", "f"), ("frame_start", "f"), ("frame_end", "f"), ("frame_current", "f")),
+    "VERTICES": (("x", "f"), ("y", "f"), ("z", "f"), ("nx", "n"), ("ny", "n"), ("nz", "n"), ("bone", "i")),
+    "TRIANGLES": (("vertex1", "i"), ("vertex2", "i"), ("vertex3", "i"), ("material", "i"),
+                  ("u1", "f"), ("w1", "f"), ("u2", "f"), ("w2", "f"), ("u3", "f"), ("w3", "f")),
+    "MATERIALS": (("name", "s"), ("texture", "s")),
+    "BONES": (("name", "s"), ("parent", "s"), ("x", "f"), ("y", "f"), ("z", "f"),
+              ("rx", "a"), ("ry", "a"), ("rz", "a"), ("length", "f")),
+    "locations": (("time", "f"), ("x", "f"), ("y", "f"), ("z", "f")),
+    "rotations": (("time", "f"), ("rx", "a"), ("ry", "a"), ("rz", "a")),
+    }
+
+tau = 2. * math.pi
+
+# groups are (section, label, layout, count, blocks). blocks must be
+# consumed before the next group is read and are (lines, columns) with the
+# text lines of the block, or None and the columns of a binary file
+
+def text_blocks(file, count):
+    for first in range(0, count, block_rows):
+        yield [file.readline() for n in range(min(block_rows, count - first))], None
+
+def text_columns(lines, layout):
+    width = len(layout)
+    kinds = [kind for name, kind in layout]
+    if 's' not in kinds:
+        tokens = split_tokens(lines, width)
+        if tokens is not None:
+            # angles and normals are floats
+            numbers = ['i' if kind == 'i' else 'f' for kind in kinds]
+            try:
+                return [array(column_typecodes[number], map(column_converters[number], tokens[k::width]))
+                        for k, number in enumerate(numbers)]
+            except (ValueError, OverflowError):
+                pass
+    rows = [parse_line(line) for line in lines]
+    for row in rows:
+        if not isinstance(row, tuple) or len(row) != width:
+            raise ValueError("Expected %i values, found %r" % (width, row))
+    return [list(column) for column in zip(*rows)] if rows else [[] for kind in kinds]
+
+def text_groups(file):
+    def rliteral():
+        return parse_line(file.readline())
+
+    def rsection(name, optional=False):
+        line = file.readline()
+        while line and not line.strip():
+            line = file.readline()
+        if optional and line == "":
+            return 0
+        if line.strip() != name:
+            raise ValueError("Expected %s section, found %r" % (name, line))
+        if name == "OBJECT":
+            return 1
+        return rliteral()
+
+    for name in ("OBJECT", "VERTICES", "TRIANGLES", "MATERIALS", "BONES"):
+        count = rsection(name)
+        if name == "BONES":
+            num_bones = count
+        yield name, "", layouts[name], count, text_blocks(file, count)
+
+    num_animations = rsection("ANIMATIONS", optional=True)
+    yield "ANIMATIONS", "", None, num_animations, ()
+    for n in range(num_animations):
+        animation_name = rliteral()
+        for i in range(num_bones):
+            bone_name = rliteral()
+            for kind in ("locations", "rotations"):
+                count = rliteral()
+                yield "ANIMATIONS", "%s/%s %s" % (animation_name, bone_name, kind), layouts[kind], count, text_blocks(file, count)
+
+def model_blocks(count, columns):
+    # columns(first, last) of the rows from first to last
+    for first in range(0, count, block_rows):
+        yield None, columns(first, min(first + block_rows, count))
+
+def split(values, width, first, last):
+    block = values[first * width:last * width]
+    return [block[k::width] for k in range(width)]
+
+def model_groups(model):
+    yield "OBJECT", "", layouts["OBJECT"], 1, model_blocks(1, lambda first, last: [
+        [model.name], [model.fps], [model.frame_start], [model.frame_end], [model.frame_current]])
+    yield "VERTICES", "", layouts["VERTICES"], model.num_vertices, model_blocks(model.num_vertices, lambda first, last:
+        split(model.positions, 3, first, last) + split(model.normals, 3, first, last) + [model.vertex_bones[first:last]])
+    yield "TRIANGLES", "", layouts["TRIANGLES"], model.num_triangles, model_blocks(model.num_triangles, lambda first, last:
+        split(model.triangles, 3, first, last) + [model.triangle_materials[first:last]] + split(model.uvs, 6, first, last))
+    materials = model.materials
+    yield "MATERIALS", "", layouts["MATERIALS"], len(materials), model_blocks(len(materials), lambda first, last:
+        [[name for name, texture in materials[first:last]], [texture for name, texture in materials[first:last]]])
+    yield "BONES", "", layouts["BONES"], model.num_bones, model_blocks(model.num_bones, lambda first, last:
+        [model.bone_names[first:last], model.bone_parents[first:last]] + split(model.bone_transforms, 7, first, last))
+    yield "ANIMATIONS", "", None, len(model.animations), ()
+    for animation in model.animations:
+        for track in animation.tracks:
+            for kind, keys in (("locations", track.locations), ("rotations", track.rotations)):
+                count = len(keys) // 4
+                yield ("ANIMATIONS", "%s/%s %s" % (animation.name, track.bone_name, kind), layouts[kind], count,
+                       model_blocks(count, lambda first, last, keys=keys: split(keys, 4, first, last)))
+
+class SectionDiff:
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.other_rows = 0
+        self.mismatches = 0
+        self.first = []
+        # maximum, sum and count of the absolute and angular errors
+        self.errors = {"absolute": [0., 0., 0], "angle": [0., 0., 0]}
+
+    def __repr__(self):
+        return "SectionDiff(%s)" % self.name
+
+    def mismatch(self, max_mismatches, **entry):
+        self.mismatches += 1
+        if len(self.first) < max_mismatches:
+            self.first.append(entry)
+
+    def add_errors(self, measure, errors, count=None):
+        stats = self.errors[measure]
+        if errors:
+            stats[0] = max(stats[0], max(errors))
+            stats[1] += math.fsum(errors)
+        stats[2] += len(errors) if count is None else count
+
+    def as_dict(self):
+        report = {
+            "rows": self.rows,
+            "other_rows": self.other_rows,
+            "mismatches": self.mismatches,
+            "first": self.first,
+            }
+        for measure, (maximum, total, count) in self.errors.items():
+            if count:
+                report[measure] = {"max": maximum, "mean": total / count}
+        return report
+
+def angle_errors(a, b):
+    return [abs((x - y + math.pi) % tau - math.pi) for x, y in zip(a, b)]
+
+def normal_errors(a, b):
+    errors = []
+    for x, y, z, ox, oy, oz in zip(*a, *b):
+        length = math.sqrt((x * x + y * y + z * z) * (ox * ox + oy * oy + oz * oz))
+        if length == 0.:
+            errors.append(0. if (x, y, z) == (ox, oy, oz) else math.pi)
+        else:
+            errors.append(math.acos(max(-1., min(1., (x * ox + y * oy + z * oz) / length))))
+    return errors
+
+def compare_block(section, label, first_row, layout, columns, other_columns,
+                  tolerance, angle_tolerance, max_mismatches):
+    num_rows = min(len(columns[0]), len(other_columns[0]))
+    for k, (name, kind) in enumerate(layout):
+        if kind == 'n' and name != "nx":
+            continue
+        if kind == 'n':
+            a = [column[:num_rows] for column in columns[k:k + 3]]
+            b = [column[:num_rows] for column in other_columns[k:k + 3]]
+            if all(x == y for x, y in zip(a, b)):
+                section.add_errors("angle", (), num_rows)
+                continue
+            errors = normal_errors(a, b)
+            section.add_errors("angle", errors)
+            limit = angle_tolerance
+            name = "normal"
+            values = lambda row: [[column[row] for column in a], [column[row] for column in b]]
+        else:
+            a = columns[k][:num_rows]
+            b = other_columns[k][:num_rows]
+            measure = "angle" if kind == 'a' else "absolute"
+            if a == b:
+                if kind in 'fa':
+                    section.add_errors(measure, (), num_rows)
+                continue
+            if kind in 'si':
+                errors = None
+            else:
+                errors = angle_errors(a, b) if kind == 'a' else [abs(x - y) for x, y in zip(a, b)]
+                section.add_errors(measure, errors)
+                limit = angle_tolerance if kind == 'a' else tolerance
+            values = lambda row: [a[row], b[row]]
+        if errors is None:
+            bad = [row for row, (x, y) in enumerate(zip(a, b)) if x != y]
+        else:
+            # nan never compares within the tolerance
+            bad = [row for row, error in enumerate(errors) if not error <= limit]
+        for row in bad:
+            section.mismatch(max_mismatches,
+                             row=("%s row %i" % (label, first_row + row)) if label else first_row + row,
+                             column=name, values=values(row),
+                             error=None if errors is None else errors[row])
+
+def numeric_columns(layout, kinds):
+    # normals count once per vector
+    return sum(1 for name, kind in layout if kind in kinds and name != "ny" and name != "nz")
+
+def compare_groups(groups, other_groups, tolerance=default_tolerance, angle_tolerance=default_angle_tolerance,
+                   max_mismatches=default_max_mismatches):
+    sections = {}
+    structure = []
+    missing = (None, None, None, 0, ())
+    for group, other_group in zip_longest(groups, other_groups, fillvalue=missing):
+        name, label, layout, count, blocks = group
+        other_name, other_label, other_layout, other_count, other_blocks = other_group
+        if (name, label) != (other_name, other_label):
+            structure.append("%s %s differs from %s %s" % (name, label, other_name, other_label))
+            # the rows after cannot be paired up any more
+            break
+        section = sections.get(name)
+        if section is None:
+            section = sections[name] = SectionDiff(name)
+        section.rows += count
+        section.other_rows += other_count
+        if count != other_count:
+            structure.append("%s %s has %i rows against %i" % (name, label, count, other_count))
+        first_row = 0
+        blocks = iter(blocks)
+        other_blocks = iter(other_blocks)
+        for (lines, columns), (other_lines, other_columns) in zip(blocks, other_blocks):
+            if lines is not None and lines == other_lines:
+                # byte identical text, every error is 0
+                section.add_errors("absolute", (), len(lines) * numeric_columns(layout, 'f'))
+                section.add_errors("angle", (), len(lines) * numeric_columns(layout, 'an'))
+                first_row += len(lines)
+                continue
+            if lines is not None:
+                columns = text_columns(lines, layout)
+            if other_lines is not None:
+                other_columns = text_columns(other_lines, layout)
+            compare_block(section, label, first_row, layout, columns, other_columns,
+                          tolerance, angle_tolerance, max_mismatches)
+            first_row += len(columns[0])
+        # the rows one side has over the other still have to be read
+        for block in blocks:
+            pass
+        for block in other_blocks:
+            pass
+    return {
+        "equal": not structure and all(section.mismatches == 0 for section in sections.values()),
+        "structure": structure,
+        "sections": {name: section.as_dict() for name, section in sections.items()},
+        }
+
+def open_groups(b3d):
+    # groups of a file of either format, the file is closed when the
+    # generator is exhausted or closed
+    if is_b3db(b3d):
+        yield from model_groups(load_b3db(b3d))
+    else:
+        with open_b3d(b3d, "r") as file:
+            yield from text_groups(file)
+
+def diff_b3d(b3d, other, tolerance=default_tolerance, angle_tolerance=default_angle_tolerance,
+             max_mismatches=default_max_mismatches):
+    groups = open_groups(b3d)
+    other_groups = open_groups(other)
+    try:
+        report = compare_groups(groups, other_groups, tolerance, angle_tolerance, max_mismatches)
+    finally:
+        groups.close()
+        other_groups.close()
+    report["files"] = [b3d, other]
+    return report
+
+def collect_pairs(path, other):
+    if not os.path.isdir(path):
+        yield path, other
+        return
+    extensions = tuple(format_extensions.values())
+    for dirpath, dirnames, filenames in os.walk(path):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if strip_compression(filename).endswith(extensions):
+                source = os.path.join(dirpath, filename)
+                yield source, os.path.join(other, os.path.relpath(source, path))
+
+def print_report(report):
+    print("%s %s" % (" ".join(report["files"]), "equal" if report["equal"] else "differ"))
+    if "error" in report:
+        print("  error", report["error"])
+        return
+    for message in report["structure"]:
+        print("  structure", message)
+    for name, section in report["sections"].items():
+        errors = "".join(" %s max %.3g mean %.3g" % (measure, section[measure]["max"], section[measure]["mean"])
+                         for measure in ("absolute", "angle") if measure in section)
+        print("  %-10s %10i rows %8i mismatches%s" % (name, section["rows"], section["mismatches"], errors))
+        for entry in section["first"]:
+            print("    %s %s %r %r%s" % (entry["row"], entry["column"], entry["values"][0], entry["values"][1],
+                                        "" if entry["error"] is None else " error %.3g" % entry["error"]))
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m io_scene_b3d.diff_b3d",
+                                     description="Compare two .b3d files or directories within tolerances")
+    parser.add_argument("path")
+    parser.add_argument("other")
+    parser.add_argument("--tolerance", type=float, default=default_tolerance,
+                        help="largest absolute difference of positions, uvs, times and lengths")
+    parser.add_argument("--angle-tolerance", type=float, default=default_angle_tolerance,
+                        help="largest difference of rotations and normals in radians")
+    parser.add_argument("--max-mismatches", type=int, default=default_max_mismatches,
+                        help="mismatches listed per section")
+    parser.add_argument("--json", action="store_true", help="print the reports as JSON")
+    args = parser.parse_args(argv)
+
+    status = 0
+    reports = []
+    start_time = datetime.datetime.now()
+    for path, other in collect_pairs(args.path, args.other):
+        try:
+            report = diff_b3d(path, other, args.tolerance, args.angle_tolerance, args.max_mismatches)
+        except (OSError, ValueError, SyntaxError, IndexError, TypeError) as exception:
+            report = {"files": [path, other], "equal": False, "error": str(exception)}
+        if not report["equal"]:
+            status = 1
+        reports.append(report)
+        if not args.json:
+            print_report(report)
+    if args.json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+        print("Compared", len(reports), "files in", elapsed_time)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -2,229 +2,438 @@ import bpy
 
 import os
 import sys
+import copy
 import math
 import mathutils
-import datetime
 
-def export_b3d(operator, b3d):
-    with open(b3d, "w", encoding="utf-8", newline="\n") as file:
-        def format(str):
-            file.write(str)
-        
-        start_time = datetime.datetime.now()
-        
-        context = bpy.context
-        scene = context.scene
-        object = context.object
-        armature = object.parent
+from array import array
+
+from io_scene_b3d.model_b3d import (
+    B3DAnimation,
+    B3DModel,
+    B3DTrack,
+    )
+from io_scene_b3d.bones_b3d import (
+    collect_boneexports,
+    collect_keyframes,
+    data_path_bone_name,
+    index_boneexports,
+    vertex_group_bones,
+    )
+from io_scene_b3d.file_b3d import (
+    format_extensions,
+    save_chunks,
+    serialize_chunk,
+    )
+from io_scene_b3d.cache_b3d import (
+    ExportCache,
+    default_max_size,
+    hash_values,
+    )
+from io_scene_b3d.compress_b3d import (
+    compression_extensions,
+    default_level,
+    file_compression,
+    strip_compression,
+    )
+from io_scene_b3d.optimize_b3d import (
+    optimize_model,
+    )
+from io_scene_b3d.reduce_b3d import (
+    reduce_track,
+    )
+from io_scene_b3d.stats_b3d import (
+    Stats,
+    )
+
+def build_animation(armature, action, stats, position_tolerance=0., angle_tolerance=0.):
+    boneexports = collect_boneexports(armature, stats)
+    animation = B3DAnimation(action.name)
+    stats.count("rna_calls")
+    collect_keyframes(action, index_boneexports(boneexports, stats), stats)
+    for boneexport in boneexports:
+        bone = boneexport.bone
+        track = B3DTrack(bone.name)
+        stats.count("rna_calls")
+        locations = boneexport.locations
+        euler_rotations = boneexport.euler_rotations
+        quaternion_rotations = boneexport.quaternion_rotations
+        for time in sorted(locations):
+            loc = locations[time]
+            track.locations.extend((time, loc[0], loc[1], loc[2]))
+        for time in sorted(quaternion_rotations):
+            rot = quaternion_rotations[time]
+            euler = mathutils.Quaternion(rot).to_euler('XYZ')
+            euler_rotations[time] = (euler.x, euler.y, euler.z)
+        for time in euler_rotations:
+            rot = euler_rotations[time]
+            track.rotations.extend((time, rot[0], rot[1], rot[2]))
+        if position_tolerance > 0. or angle_tolerance > 0.:
+            reduce_track(track, position_tolerance, angle_tolerance)
+        animation.tracks.append(track)
+    return animation
+
+def digest_action(action, skeleton_digest, stats):
+    if action is None:
+        return hash_values(skeleton_digest)
+    values = [skeleton_digest, action.name]
+    stats.count("rna_calls", 2)
+    for fcurve in action.fcurves:
+        keyframe_points = fcurve.keyframe_points
+        co = array('f', [0.]) * (len(keyframe_points) * 2)
+        keyframe_points.foreach_get("co", co)
+        values.extend((fcurve.data_path, fcurve.array_index, co))
+        stats.count("rna_calls", 6)
+    return hash_values(*values)
+
+def compatible_actions(armature, stats):
+    # actions with at least one fcurve animating a bone of the armature
+    bones = armature.data.bones
+    actions = []
+    stats.count("rna_calls", 3)
+    for action in bpy.data.actions:
+        stats.count("rna_calls", 2)
+        for fcurve in action.fcurves:
+            name = data_path_bone_name(fcurve.data_path)
+            stats.count("rna_calls", 2)
+            if name is None:
+                continue
+            stats.count("rna_calls")
+            if bones.get(name) is not None:
+                actions.append(action)
+                break
+    return actions
+
+def action_filepath(b3d, action, format, stats):
+    # one file per action named like the default _Idle.b3d, compressed
+    # like it
+    name = action.name if action.name.startswith("_") else "_" + action.name
+    stats.count("rna_calls", 2)
+    extension = format_extensions[format] + compression_extensions[file_compression(b3d)]
+    return os.path.join(os.path.dirname(b3d), bpy.path.clean_name(name) + extension)
+
+def lod_filepath(b3d, level):
+    # _Idle.b3d.gz becomes _Idle.lod1.b3d.gz
+    compression = compression_extensions[file_compression(b3d)]
+    base, extension = os.path.splitext(strip_compression(b3d))
+    return "%s.lod%i%s%s" % (base, level, extension, compression)
+
+def export_b3d(operator, b3d, format='TEXT', all_actions=False,
+               use_cache=False, invalidate_cache=False, cache_size=default_max_size, log_path=None,
+               compression_level=default_level, position_tolerance=0., angle_tolerance=0.,
+               optimize_vertex_cache=False, lod_ratios=(), write_index=False):
+    stats = Stats("Exported", b3d)
     
-        def is_object_instance_from_selected(object_instance):
-            if object_instance.parent:
-                return object_instance.parent.original.select_get()
-            else:
-                return object_instance.object.original.select_get()
-        
-        def selected_object_instance():
-            depsgraph = context.evaluated_depsgraph_get()
-            for object_instance in depsgraph.object_instances:
-                if is_object_instance_from_selected(object_instance):
-                    return object_instance
-        
-        def mesh_triangulate(mesh):
-            import bmesh
-            bm = bmesh.new()
-            bm.from_mesh(mesh)
-            bmesh.ops.triangulate(bm, faces=bm.faces)
-            bm.to_mesh(mesh)
-            bm.free()
+    context = bpy.context
+    scene = context.scene
+    object = context.object
+    armature = object.parent
+    stats.count("rna_calls", 3)
+    # only an armature parent has bones and actions to export
+    if armature is not None:
+        if armature.type != 'ARMATURE':
+            armature = None
+        stats.count("rna_calls")
+    
+    def is_object_instance_from_selected(object_instance):
+        stats.count("rna_calls", 4)
+        if object_instance.parent:
+            return object_instance.parent.original.select_get()
+        else:
+            return object_instance.object.original.select_get()
+    
+    def selected_object(depsgraph):
+        # the instances only live during the iteration, their original is
+        # kept and evaluated again
+        stats.count("rna_calls")
+        for object_instance in depsgraph.object_instances:
+            stats.count("rna_calls")
+            if is_object_instance_from_selected(object_instance):
+                stats.count("rna_calls", 2)
+                return object_instance.object.original
 
-        # object
-        format("OBJECT\n")
-        object_name = object.name
-        object_base = os.path.splitext(object_name)[0]
-        format('"%s", %.3f, %.3f, %.3f, %.3f\n' % (object_base, scene.render.fps, scene.frame_start, scene.frame_end, scene.frame_current))
+    def transform_positions(matrix, co):
+        # same arithmetic as matrix @ vector in mathutils, float products
+        # summed as double starting from 0. then stored as float, so the
+        # output is unchanged down to the sign of zero
+        if matrix == mathutils.Matrix.Identity(4):
+            return [v + 0. for v in co]
+        x = co[0::3]
+        y = co[1::3]
+        z = co[2::3]
+        positions = [0.] * len(co)
+        for row in range(3):
+            m0, m1, m2, m3 = matrix[row]
+            p0 = array('f', [m0 * v for v in x])
+            p1 = array('f', [m1 * v for v in y])
+            p2 = array('f', [m2 * v for v in z])
+            positions[row::3] = array('f', [0. + a + b + c + m3 for a, b, c in zip(p0, p1, p2)])
+        return positions
+    
+    # object
+    object_name = object.name
+    object_base = os.path.splitext(object_name)[0]
+    model = B3DModel(object_base)
+    model.fps = scene.render.fps
+    model.frame_start = scene.frame_start
+    model.frame_end = scene.frame_end
+    model.frame_current = scene.frame_current
+    stats.count("rna_calls", 6)
+    
+    def collect_mesh(model, prefix=""):
+        # the temporary mesh of the evaluated object is read in bulk and
+        # released even when reading it fails. the phases and counters of a
+        # level of detail are prefixed so they stay apart from the model's
+        with stats.phase(prefix + "depsgraph"):
+            depsgraph = context.evaluated_depsgraph_get()
+            evaluated_object = selected_object(depsgraph).evaluated_get(depsgraph)
+            stats.count("rna_calls", 2)
+        with stats.phase(prefix + "to_mesh"):
+            mesh = evaluated_object.to_mesh()
+            stats.count("rna_calls")
+        try:
+            read_mesh(model, mesh, prefix)
+        finally:
+            evaluated_object.to_mesh_clear()
+            stats.count("rna_calls")
         
-        object_instance = selected_object_instance()
-        mesh = object_instance.object.to_mesh()
-        mesh_triangulate(mesh)
+        # vertex cache
+        if optimize_vertex_cache:
+            with stats.phase(prefix + "vertex_cache"):
+                acmr_before, acmr_after = optimize_model(model)
+            print("ACMR", "%.3f" % acmr_before, "->", "%.3f" % acmr_after)
+    
+    def read_mesh(model, mesh, prefix):
+        # the triangles are the loop triangles of the tessellation, so the
+        # mesh is neither copied through bmesh nor modified
+        with stats.phase(prefix + "triangulate"):
+            mesh.calc_loop_triangles()
+            stats.count("rna_calls")
         
         # vertices
-        format("\nVERTICES\n")
-        format("%i\n" % len(mesh.vertices))
-        matrix_basis = object.matrix_basis
-        for vert in mesh.vertices:
-            group = -1
-            weight = 0.
-            for groupelem in vert.groups:
-                if groupelem.weight > weight:
-                    group = groupelem.group
-                    weight = groupelem.weight
-            co = matrix_basis @ vert.co
-            normal = vert.normal
-            index = -1
-            if group != -1:
-                name = object.vertex_groups[group].name
-                index = armature.data.bones.find(name)
-            format("%.6f, %.6f, %.6f, %.6f, %.6f, %.6f, %i\n" % (co.x, co.y, co.z, normal.x, normal.y, normal.z, index))
+        with stats.phase(prefix + "vertices"):
+            num_vertices = len(mesh.vertices)
+            co = array('f', [0.]) * (num_vertices * 3)
+            mesh.vertices.foreach_get("co", co)
+            normals = array('f', [0.]) * (num_vertices * 3)
+            mesh.vertices.foreach_get("normal", normals)
+            positions = transform_positions(object.matrix_basis, co)
+            stats.count("rna_calls", 7)
+        stats.count(prefix + "vertices", num_vertices)
+        with stats.phase(prefix + "vertex_groups"):
+            vertex_bones = array('i', [-1]) * num_vertices
+            stats.count("rna_calls", 2)
+            if len(object.vertex_groups) > 0:
+                group_bones = vertex_group_bones(object, armature, stats)
+                # the vertices and their groups are read one by one
+                num_calls = 1
+                for vert in mesh.vertices:
+                    group = -1
+                    weight = 0.
+                    num_calls += 2
+                    for groupelem in vert.groups:
+                        num_calls += 2
+                        if groupelem.weight > weight:
+                            group = groupelem.group
+                            weight = groupelem.weight
+                            num_calls += 2
+                    if group != -1:
+                        vertex_bones[vert.index] = group_bones[group]
+                        num_calls += 1
+                stats.count("rna_calls", num_calls)
+        model.positions = positions
+        model.normals = normals
+        model.vertex_bones = vertex_bones
         
         # triangles
-        format("\nTRIANGLES\n")
-        format("%i\n" % len(mesh.polygons))
-        uv_loops = mesh.uv_layers.active.data
-        for poly in mesh.polygons:
-            v1, v2, v3 = poly.vertices
+        with stats.phase(prefix + "triangles"):
+            loop_triangles = mesh.loop_triangles
+            num_triangles = len(loop_triangles)
+            triangles = array('i', [0]) * (num_triangles * 3)
+            loop_triangles.foreach_get("vertices", triangles)
+            triangle_loops = array('i', [0]) * (num_triangles * 3)
+            loop_triangles.foreach_get("loops", triangle_loops)
+            loop_uvs = array('f', [0.]) * (len(mesh.loops) * 2)
+            mesh.uv_layers.active.data.foreach_get("uv", loop_uvs)
+            stats.count("rna_calls", 12)
             # hack around poly.material_index being 0 even when no material
             if len(object.material_slots) == 0:
-                mat = -1
+                triangle_materials = [-1] * num_triangles
             else:
-                mat = poly.material_index
-            uv1 = uv_loops[poly.loop_start].uv
-            uv2 = uv_loops[poly.loop_start + 1].uv
-            uv3 = uv_loops[poly.loop_start + 2].uv
-            format("%i, %i, %i, %i, %.6f, %.6f, %.6f, %.6f, %.6f, %.6f\n" %
-                (v1, v2, v3, mat, uv1[0], 1.0 - uv1[1], uv2[0], 1.0 - uv2[1], uv3[0], 1.0 - uv3[1]))
-        
-        # materials
-        format("\nMATERIALS\n")
-        format("%i\n" % len(object.material_slots))
+                triangle_materials = array('i', [0]) * num_triangles
+                loop_triangles.foreach_get("material_index", triangle_materials)
+                stats.count("rna_calls")
+            uvs = [loop_uvs[loop * 2 + k] for loop in triangle_loops for k in (0, 1)]
+            uvs[1::2] = [1.0 - v for v in uvs[1::2]]
+        stats.count(prefix + "triangles", num_triangles)
+        model.triangles = triangles
+        model.triangle_materials = triangle_materials
+        model.uvs = uvs
+    
+    collect_mesh(model)
+    
+    # materials
+    with stats.phase("materials"):
+        stats.count("rna_calls")
         for material_slot in object.material_slots:
             material = material_slot.material
+            stats.count("rna_calls", 4)
             if not material.node_tree:
-                format('"%s", ""\n' % (material_slot.name))
+                model.materials.append((material_slot.name, ""))
             else:
                 def find_tex_image_node():
+                    stats.count("rna_calls", 2)
                     for node in material.node_tree.nodes:
+                        stats.count("rna_calls", 2)
                         if node.type == 'TEX_IMAGE':
                             return node
                     return None
                 
                 node = find_tex_image_node()
                 if not node:
-                    format('"%s", ""\n' % (material_slot.name))
+                    model.materials.append((material_slot.name, ""))
                 else:
                     # remove starting //
                     filename = os.path.split(node.image.filepath)[1]
-                    format('"%s", "%s"\n' % (material_slot.name, filename))
+                    stats.count("rna_calls", 2)
+                    model.materials.append((material_slot.name, filename))
+    stats.count("materials", len(model.materials))
+    
+    # bones
+    if armature is not None:
+        def compute_matrix(bone):
+            parent_bone = bone.parent
+            if not parent_bone:
+                base_bone_correction = mathutils.Matrix.Rotation(math.pi / 2, 4, 'Z')
+                stats.count("rna_calls", 2)
+                return base_bone_correction @ bone.matrix_local
+            else:
+                stats.count("rna_calls", 3)
+                return parent_bone.matrix_local.inverted() @ bone.matrix_local
         
-        # bones
-        format("\nBONES\n")
-        if not armature or armature.type != 'ARMATURE':
-            format("0\n")
-            format("\nANIMATIONS\n")
-            format("0\n")
-        else:
-            class BoneExport:
-                def __init__(self, prefix, bone):
-                    self.prefix = prefix
-                    self.bone = bone
-                    self.locations = {}
-                    self.euler_rotations = {}
-                    self.quaternion_rotations = {}
-                
-                def __repr__(self):
-                    return "BoneExport(%s)" % self.prefix
-            
-            def collect_boneexports():
-                boneexports = []
-                for bone in armature.data.bones:
-                    prefix = 'pose.bones["%s"]' % bone.name
-                    boneexport = BoneExport(prefix, bone)
-                    boneexports.append(boneexport)
-                return boneexports
-            
-            def get_boneexport(name):
-                for boneexport in boneexports:
-                    if boneexport.name == name:
-                        return boneexport
-                return None
-            
-            def find_boneexport(data_path):
-                for idx, boneexport in enumerate(boneexports):
-                    if data_path.startswith(boneexport.prefix):
-                        return boneexport
-                return None
-            
-            def compute_matrix(bone):
-                parent_bone = bone.parent
-                if not parent_bone:
-                    base_bone_correction = mathutils.Matrix.Rotation(math.pi / 2, 4, 'Z')
-                    return base_bone_correction @ bone.matrix_local
-                else:
-                    return parent_bone.matrix_local.inverted() @ bone.matrix_local
-            
-            boneexports = collect_boneexports()
-            format("%i\n" % len(boneexports))
+        with stats.phase("bones"):
+            boneexports = collect_boneexports(armature, stats)
             for boneexport in boneexports:
                 bone = boneexport.bone
                 parent_bone = bone.parent
                 parent_name = "" if (parent_bone is None) else parent_bone.name
+                stats.count("rna_calls", 3 if parent_bone is None else 4)
                 matrix = compute_matrix(bone)
                 pos = matrix.to_translation()
                 rot = matrix.to_euler('XYZ')
                 length = bone.length
-                format('"%s", "%s", %.6f, %.6f, %.6f, %.6f, %.6f, %.6f, %.3f\n' %
-                    (bone.name, parent_name, pos[0], pos[1], pos[2], rot[0], rot[1], rot[2], length))
-            
-            # animations
-            format("\nANIMATIONS\n")
-            if not armature or not armature.animation_data or not armature.animation_data.action:
-                format("0\n")
-            else:
-                action = armature.animation_data.action
-                format("1\n")
-                format('"%s"\n' % action.name)
-                for fcurve in action.fcurves:
-                    data_path = fcurve.data_path
-                    boneexport = find_boneexport(data_path)
-                    dict = None
-                    if data_path.endswith("location"):
-                        dict = boneexport.locations
-                        kind = 'location'
-                    elif data_path.endswith("rotation_euler"):
-                        dict = boneexport.euler_rotations
-                        kind = 'euler_rotation'
-                    elif data_path.endswith("rotation_quaternion"):
-                        dict = boneexport.quaternion_rotations
-                        kind = 'quaternion_rotation'
-                    if dict is not None:
-                        for keyframe in fcurve.keyframe_points:
-                            time = keyframe.co[0]
-                            value = keyframe.co[1]
-                            entry = dict.get(time)
-                            if entry is None:
-                                if kind == 'location':
-                                    entry = [0., 0., 0.]
-                                    dict[time] = entry
-                                elif kind == 'euler_rotation':
-                                    entry = [0., 0., 0.]
-                                    dict[time] = entry
-                                elif kind == 'quaternion_rotation':
-                                    entry = [0., 0., 0., 0.]
-                                    dict[time] = entry
-                            entry[fcurve.array_index] = value
-            for boneexport in boneexports:
-                bone = boneexport.bone
-                format('"%s"\n' % bone.name)
-                locations = boneexport.locations
-                euler_rotations = boneexport.euler_rotations
-                quaternion_rotations = boneexport.quaternion_rotations
-                format("%i\n" % len(locations))
-                for time in sorted(locations):
-                    loc = locations[time]
-                    format("%.3f, %.6f, %.6f, %.6f\n" % (time, loc[0], loc[1], loc[2]))
-                for time in sorted(quaternion_rotations):
-                    rot = quaternion_rotations[time]
-                    euler = mathutils.Quaternion(rot).to_euler('XYZ')
-                    euler_rotations[time] = (euler.x, euler.y, euler.z)
-                format("%i\n" % len(euler_rotations))
-                for time in euler_rotations:
-                    rot = euler_rotations[time]
-                    format("%.3f, %.6f, %.6f, %.6f\n" % (time, rot[0], rot[1], rot[2]))
-        
-        # cleanup
-        # this crashes blender
-        # object_instance.object.to_mesh_clear()
-        
-        # report
-        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
-        print("Exported", "in", elapsed_time)
+                model.bone_names.append(bone.name)
+                model.bone_parents.append(parent_name)
+                model.bone_transforms.extend((pos[0], pos[1], pos[2], rot[0], rot[1], rot[2], length))
+        stats.count("bones", model.num_bones)
+    
+    # levels of detail
+    # every level is the evaluated mesh with a temporary decimate modifier,
+    # vertex groups and uvs are interpolated by the modifier and the rest
+    # of the model is shared with the full resolution one
+    lods = []
+    for level, ratio in enumerate(lod_ratios, 1):
+        lod = copy.copy(model)
+        modifier = object.modifiers.new("B3D LOD", type='DECIMATE')
+        try:
+            modifier.decimate_type = 'COLLAPSE'
+            modifier.ratio = ratio
+            stats.count("rna_calls", 4)
+            collect_mesh(lod, "lod%i " % level)
+        finally:
+            object.modifiers.remove(modifier)
+            stats.count("rna_calls", 2)
+        lods.append(lod)
+    
+    # animations
+    targets = []
+    if armature is not None:
+        if all_actions:
+            targets = [(action_filepath(b3d, action, format, stats), action)
+                       for action in compatible_actions(armature, stats)]
+        else:
+            animation_data = armature.animation_data
+            active_action = None if animation_data is None else animation_data.action
+            stats.count("rna_calls", 1 if animation_data is None else 2)
+            if active_action is not None:
+                targets = [(b3d, active_action)]
+    if not targets:
+        targets = [(b3d, None)]
+    
+    # write
+    # every chunk is keyed on a digest of its inputs so unchanged ones are
+    # reused from the cache and unchanged files are not rewritten
+    cache = ExportCache(os.path.dirname(b3d) if use_cache else None, cache_size)
+    if invalidate_cache:
+        cache.invalidate()
+    def digest_mesh(model):
+        return hash_values(model.name, model.fps, model.frame_start, model.frame_end, model.frame_current,
+                           model.positions, model.normals, model.vertex_bones,
+                           model.triangles, model.triangle_materials, model.uvs)
+    digests = {
+        'mesh': digest_mesh(model),
+        'materials': hash_values(*[value for material in model.materials for value in material]),
+        'skeleton': hash_values(*model.bone_names, *model.bone_parents, model.bone_transforms),
+        }
+    meshes = [('mesh', model)]
+    for level, lod in enumerate(lods, 1):
+        key = "mesh:lod%i" % level
+        digests[key] = digest_mesh(lod)
+        meshes.append((key, lod))
+    # the static chunks are serialized once and shared by every file
+    static_chunks = {}
+    def static_chunk(key, group, chunk_model):
+        if key not in static_chunks:
+            static_chunks[key] = cache.chunk(format + ":" + key, digests[key], lambda: build_chunk(group, chunk_model))
+        return static_chunks[key]
+    def build_chunk(group, chunk_model, action=None):
+        if group == 'animations':
+            with stats.phase("keyframes"):
+                model.animations = [] if action is None else [build_animation(armature, action, stats, position_tolerance, angle_tolerance)]
+                stats.count("keys", sum(len(track.locations) // 4 + len(track.rotations) // 4
+                                        for animation in model.animations for track in animation.tracks))
+        with stats.phase("serialize " + group):
+            return serialize_chunk(chunk_model, group, format)
+    # every target file, written or unchanged
+    files = []
+    for filepath, action in targets:
+        action_key = format + ":action:" + ("" if action is None else action.name)
+        action_digest = digest_action(action, digests['skeleton'], stats)
+        if action is not None:
+            stats.count("rna_calls")
+        if position_tolerance > 0. or angle_tolerance > 0.:
+            action_digest = hash_values(action_digest, position_tolerance, angle_tolerance)
+        # the animation chunk is shared by every level
+        animation_chunk = None
+        for level, (mesh_key, mesh_model) in enumerate(meshes):
+            path = filepath if level == 0 else lod_filepath(filepath, level)
+            files.append(path)
+            # the level only changes the bytes of compressed files
+            level_digest = compression_level if file_compression(path) != 'NONE' else None
+            file_digest = hash_values(format, write_index, level_digest, digests[mesh_key], digests['materials'],
+                                      digests['skeleton'], action_digest)
+            if cache.file_unchanged(path, file_digest):
+                print("Unchanged", path)
+                continue
+            if animation_chunk is None:
+                animation_chunk = cache.chunk(action_key, action_digest, lambda: build_chunk('animations', model, action))
+            chunks = [static_chunk(mesh_key, 'mesh', mesh_model),
+                      static_chunk('materials', 'materials', model),
+                      static_chunk('skeleton', 'skeleton', model),
+                      animation_chunk]
+            with stats.phase("write"):
+                save_chunks(path, chunks, format, compression_level, write_index)
+            cache.record_file(path, file_digest)
+            stats.count("files")
+            print("Exported", "" if action is None else action.name, "to", path)
+            if action is not None:
+                stats.count("rna_calls")
+    cache.save()
+    stats.count("cache_hits", cache.hits)
+    stats.count("cache_misses", cache.misses)
+    
+    # report
+    operator.report({'INFO'}, stats.summary())
+    stats.write_log(log_path)
+    print(stats.summary())
+    return files
@@ -0,0 +1,1268 @@
+# lightweight stand-ins for the bpy and mathutils modules so
+# import_b3d and export_b3d run under plain CPython
+#
+# this module has no bpy dependency, it replaces it
+#
+#   install()
+#   calls.clear()
+#   import_b3d(operator, b3d)
+#   calls.most_common(10)
+#
+# only what the addon uses is modelled: meshes with their vertices, loops,
+# polygons and uv layers, objects with vertex groups, material slots and
+# modifiers, armatures with edit bones, bones and pose bones, actions with
+# fcurves and keyframe points, materials and their node tree, images, the
+# depsgraph, loop triangles and bpy.ops.object.mode_set. every
+# attribute read and write, method call, len and element access of these
+# objects is counted in calls by RNA type and name, the way they would
+# cross into Blender. mathutils is pure math and is not counted
+#
+# the geometry is kept in flat arrays like Blender does so foreach_get and
+# foreach_set copy whole columns. to_mesh applies a decimate modifier by
+# keeping the first polygons only, the armature modifier is left out since
+# the exporter reads the rest pose
+
+import sys
+import math
+import types
+import collections
+import contextlib
+
+from array import array
+
+calls = collections.Counter()
+
+counting = True
+
+@contextlib.contextmanager
+def uncounted():
+    # scene setup by the harness itself
+    global counting
+    counting = False
+    try:
+        yield
+    finally:
+        counting = True
+
+def count(key, n=1):
+    if counting:
+        calls[key] += n
+
+def peek(rna, name):
+    # uncounted read of a public attribute
+    return object.__getattribute__(rna, name)
+
+class RNA:
+    # attribute reads and writes of public names are counted, the state of
+    # the fakes is kept in underscore names
+    def __getattribute__(self, name):
+        if name[0] != "_" and counting:
+            calls["%s.%s" % (type(self).__name__, name)] += 1
+        return object.__getattribute__(self, name)
+
+    def __setattr__(self, name, value):
+        if name[0] != "_" and counting:
+            calls["%s.%s=" % (type(self).__name__, name)] += 1
+        object.__setattr__(self, name, value)
+
+    def _init(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+# mathutils
+
+class Vector(tuple):
+    def __new__(cls, values=(0., 0., 0.)):
+        return tuple.__new__(cls, (float(value) for value in values))
+
+    x = property(lambda self: self[0])
+    y = property(lambda self: self[1])
+    z = property(lambda self: self[2])
+    w = property(lambda self: self[3])
+
+    def __repr__(self):
+        return "Vector(%s)" % (tuple(self),)
+
+class Matrix:
+    def __init__(self, rows=((1., 0., 0., 0.), (0., 1., 0., 0.), (0., 0., 1., 0.), (0., 0., 0., 1.))):
+        self._rows = [[float(value) for value in row] for row in rows]
+
+    def __repr__(self):
+        return "Matrix(%s)" % (self._rows,)
+
+    @classmethod
+    def Identity(cls, size):
+        return cls([[1. if r == c else 0. for c in range(size)] for r in range(size)])
+
+    @classmethod
+    def Translation(cls, vector):
+        matrix = cls.Identity(4)
+        for r in range(3):
+            matrix._rows[r][3] = float(vector[r])
+        return matrix
+
+    @classmethod
+    def Rotation(cls, angle, size, axis):
+        c = math.cos(angle)
+        s = math.sin(angle)
+        if axis == 'X':
+            rows = [[1., 0., 0.], [0., c, -s], [0., s, c]]
+        elif axis == 'Y':
+            rows = [[c, 0., s], [0., 1., 0.], [-s, 0., c]]
+        elif axis == 'Z':
+            rows = [[c, -s, 0.], [s, c, 0.], [0., 0., 1.]]
+        else:
+            raise ValueError("Only the X, Y and Z axes are modelled")
+        matrix = cls(rows)
+        return matrix.to_4x4() if size == 4 else matrix
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, row):
+        return Vector(self._rows[row])
+
+    def __eq__(self, other):
+        return isinstance(other, Matrix) and self._rows == other._rows
+
+    def __matmul__(self, other):
+        if isinstance(other, Matrix):
+            columns = list(zip(*other._rows))
+            return Matrix([[sum(a * b for a, b in zip(row, column)) for column in columns] for row in self._rows])
+        values = list(other)
+        if len(values) == 3 and len(self._rows) == 4:
+            values.append(1.)
+            return Vector([sum(a * b for a, b in zip(row, values)) for row in self._rows[:3]])
+        return Vector([sum(a * b for a, b in zip(row, values)) for row in self._rows])
+
+    def copy(self):
+        return Matrix(self._rows)
+
+    def to_3x3(self):
+        return Matrix([row[:3] for row in self._rows[:3]])
+
+    def to_4x4(self):
+        rows = [row[:3] + [row[3] if len(row) > 3 else 0.] for row in self._rows[:3]]
+        rows.append(self._rows[3] if len(self._rows) > 3 else [0., 0., 0., 1.])
+        return Matrix(rows)
+
+    def to_translation(self):
+        return Vector([row[3] for row in self._rows[:3]])
+
+    def inverted(self):
+        # Gauss-Jordan with partial pivoting
+        size = len(self._rows)
+        rows = [row[:] + [1. if r == c else 0. for c in range(size)] for r, row in enumerate(self._rows)]
+        for c in range(size):
+            pivot = max(range(c, size), key=lambda r: abs(rows[r][c]))
+            if abs(rows[pivot][c]) < 1e-12:
+                raise ValueError("Matrix does not have an inverse")
+            rows[c], rows[pivot] = rows[pivot], rows[c]
+            scale = rows[c][c]
+            rows[c] = [value / scale for value in rows[c]]
+            for r in range(size):
+                if r != c and rows[r][c] != 0.:
+                    factor = rows[r][c]
+                    rows[r] = [value - factor * pivot_value for value, pivot_value in zip(rows[r], rows[c])]
+        return Matrix([row[size:] for row in rows])
+
+    def to_euler(self, order='XYZ'):
+        # same choice between the two solutions as mat3_normalized_to_eul2
+        if order != 'XYZ':
+            raise ValueError("Only the XYZ order is modelled")
+        m = self.to_3x3()._rows
+        for c in range(3):
+            length = math.sqrt(m[0][c] ** 2 + m[1][c] ** 2 + m[2][c] ** 2)
+            if length:
+                for r in range(3):
+                    m[r][c] /= length
+        cy = math.hypot(m[0][0], m[1][0])
+        if cy > 16. * 1.1920928955078125e-07:
+            first = (math.atan2(m[2][1], m[2][2]), math.atan2(-m[2][0], cy), math.atan2(m[1][0], m[0][0]))
+            second = (math.atan2(-m[2][1], -m[2][2]), math.atan2(-m[2][0], -cy), math.atan2(-m[1][0], -m[0][0]))
+            if sum(map(abs, first)) > sum(map(abs, second)):
+                first = second
+            return Euler(first, order)
+        return Euler((math.atan2(-m[1][2], m[1][1]), math.atan2(-m[2][0], cy), 0.), order)
+
+class Euler(Vector):
+    def __new__(cls, angles=(0., 0., 0.), order='XYZ'):
+        if order != 'XYZ':
+            raise ValueError("Only the XYZ order is modelled")
+        return Vector.__new__(cls, angles)
+
+    order = property(lambda self: 'XYZ')
+
+    def to_matrix(self):
+        ci, cj, ch = math.cos(self[0]), math.cos(self[1]), math.cos(self[2])
+        si, sj, sh = math.sin(self[0]), math.sin(self[1]), math.sin(self[2])
+        cc, cs, sc, ss = ci * ch, ci * sh, si * ch, si * sh
+        return Matrix([[cj * ch, sj * sc - cs, sj * cc + ss],
+                       [cj * sh, sj * ss + cc, sj * cs - sc],
+                       [-sj, cj * si, cj * ci]])
+
+class Quaternion(Vector):
+    def __new__(cls, values=(1., 0., 0., 0.)):
+        return Vector.__new__(cls, values)
+
+    w = property(lambda self: self[0])
+    x = property(lambda self: self[1])
+    y = property(lambda self: self[2])
+    z = property(lambda self: self[3])
+
+    def to_matrix(self):
+        w, x, y, z = self
+        length = w * w + x * x + y * y + z * z
+        s = 2. / length if length else 0.
+        return Matrix([[1. - s * (y * y + z * z), s * (x * y - w * z), s * (x * z + w * y)],
+                       [s * (x * y + w * z), 1. - s * (x * x + z * z), s * (y * z - w * x)],
+                       [s * (x * z - w * y), s * (y * z + w * x), 1. - s * (x * x + y * y)]])
+
+    def to_euler(self, order='XYZ'):
+        return self.to_matrix().to_euler(order)
+
+# collections
+
+class PropCollection(RNA):
+    # a bpy_prop_collection over _items(), elements are counted on access
+    def _items(self):
+        raise NotImplementedError
+
+    def _length(self):
+        return len(self._items())
+
+    def _item(self, index):
+        return self._items()[index]
+
+    def __len__(self):
+        count("len(%s)" % type(self).__name__)
+        return self._length()
+
+    def __bool__(self):
+        return self._length() > 0
+
+    def __iter__(self):
+        key = "%s[]" % type(self).__name__
+        for index in range(self._length()):
+            count(key)
+            yield self._item(index)
+
+    def __getitem__(self, key):
+        count("%s[]" % type(self).__name__)
+        if isinstance(key, str):
+            for item in self._items():
+                if item._name == key:
+                    return item
+            raise KeyError("bpy_prop_collection[key]: key \"%s\" not found" % key)
+        length = self._length()
+        if key < 0:
+            key += length
+        if not 0 <= key < length:
+            raise IndexError("bpy_prop_collection[index]: index %i out of range" % key)
+        return self._item(key)
+
+    def get(self, name, default=None):
+        for item in self._items():
+            if item._name == name:
+                return item
+        return default
+
+    def find(self, name):
+        for index, item in enumerate(self._items()):
+            if item._name == name:
+                return index
+        return -1
+
+    def _column(self, attr):
+        raise AttributeError("foreach: %s has no %s" % (type(self).__name__, attr))
+
+    def _set_column(self, attr, values):
+        raise AttributeError("foreach: %s has no writable %s" % (type(self).__name__, attr))
+
+    def foreach_get(self, attr, seq):
+        column = self._column(attr)
+        if len(seq) != len(column):
+            raise RuntimeError("internal error setting the array")
+        seq[:] = type(seq)(column) if isinstance(seq, list) else array(seq.typecode, column)
+
+    def foreach_set(self, attr, seq):
+        column = self._column(attr)
+        if len(seq) != len(column):
+            raise RuntimeError("internal error setting the array")
+        self._set_column(attr, seq)
+
+def unique_name(name, items):
+    names = set(item._name for item in items)
+    if name not in names:
+        return name
+    n = 1
+    while "%s.%03i" % (name, n) in names:
+        n += 1
+    return "%s.%03i" % (name, n)
+
+class ID(RNA):
+    def __init__(self, name):
+        self._init(_name=name, use_fake_user=False)
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, self._name)
+
+    name = property(lambda self: self._name)
+
+class BlendDataIDs(PropCollection):
+    def __init__(self, factory):
+        self._init(_list=[], _factory=factory)
+
+    def _items(self):
+        return self._list
+
+    def _add(self, name, *args):
+        id = self._factory(unique_name(name, self._list), *args)
+        self._list.append(id)
+        return id
+
+    def new(self, name, *args, **kwargs):
+        return self._add(name, *args)
+
+    def remove(self, id, do_unlink=True):
+        self._list.remove(id)
+
+class BlendDataMeshes(BlendDataIDs):
+    pass
+
+class BlendDataObjects(BlendDataIDs):
+    pass
+
+class BlendDataMaterials(BlendDataIDs):
+    pass
+
+class BlendDataActions(BlendDataIDs):
+    pass
+
+class BlendDataArmatures(BlendDataIDs):
+    pass
+
+class BlendDataCollections(BlendDataIDs):
+    pass
+
+class BlendDataImages(BlendDataIDs):
+    def load(self, filepath, check_existing=False):
+        if check_existing:
+            for image in self._list:
+                if image._filepath == filepath:
+                    return image
+        image = self._add(filepath.replace("\\", "/").rsplit("/", 1)[-1])
+        image._init(_filepath=filepath)
+        return image
+
+# images, materials and nodes
+
+class Image(ID):
+    filepath = property(lambda self: self._filepath)
+
+class NodeSocket(RNA):
+    def __init__(self, name):
+        self._init(_name=name)
+
+    name = property(lambda self: self._name)
+
+class NodeSockets(PropCollection):
+    def __init__(self, sockets):
+        self._init(_list=sockets)
+
+    def _items(self):
+        return self._list
+
+class Node(RNA):
+    def __init__(self, name, type, inputs=(), outputs=()):
+        self._init(_name=name, _type=type, image=None,
+                   _inputs=[NodeSocket(socket) for socket in inputs],
+                   _outputs=[NodeSocket(socket) for socket in outputs])
+
+    name = property(lambda self: self._name)
+    type = property(lambda self: self._type)
+    inputs = property(lambda self: NodeSockets(self._inputs))
+    outputs = property(lambda self: NodeSockets(self._outputs))
+
+node_types = {
+    'ShaderNodeOutputMaterial': ("Material Output", 'OUTPUT_MATERIAL', ("Surface",), ()),
+    'ShaderNodeBsdfPrincipled': ("Principled BSDF", 'BSDF_PRINCIPLED', ("Base Color",), ("BSDF",)),
+    'ShaderNodeTexImage': ("Image Texture", 'TEX_IMAGE', ("Vector",), ("Color", "Alpha")),
+    }
+
+class Nodes(PropCollection):
+    def __init__(self, tree):
+        self._init(_tree=tree)
+
+    def _items(self):
+        return self._tree._nodes
+
+    def new(self, type):
+        name, node_type, inputs, outputs = node_types[type]
+        node = Node(unique_name(name, self._tree._nodes), node_type, inputs, outputs)
+        self._tree._nodes.append(node)
+        return node
+
+class NodeLink(RNA):
+    def __init__(self, from_socket, to_socket):
+        self._init(from_socket=from_socket, to_socket=to_socket)
+
+class NodeLinks(PropCollection):
+    def __init__(self, tree):
+        self._init(_tree=tree)
+
+    def _items(self):
+        return self._tree._links
+
+    def new(self, input, output):
+        link = NodeLink(input, output)
+        self._tree._links.append(link)
+        return link
+
+class NodeTree(RNA):
+    def __init__(self):
+        self._init(_nodes=[], _links=[])
+        for type in ('ShaderNodeOutputMaterial', 'ShaderNodeBsdfPrincipled'):
+            name, node_type, inputs, outputs = node_types[type]
+            self._nodes.append(Node(name, node_type, inputs, outputs))
+
+    nodes = property(lambda self: Nodes(self))
+    links = property(lambda self: NodeLinks(self))
+
+class Material(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_use_nodes=False, _node_tree=None)
+
+    def _set_use_nodes(self, value):
+        if value and self._node_tree is None:
+            self._node_tree = NodeTree()
+        self._use_nodes = value
+
+    use_nodes = property(lambda self: self._use_nodes, _set_use_nodes)
+    node_tree = property(lambda self: self._node_tree)
+
+# meshes
+
+class VertexGroupElement(RNA):
+    def __init__(self, weights):
+        self._init(_weights=weights)
+
+    group = property(lambda self: self._weights[0])
+    weight = property(lambda self: self._weights[1])
+
+class VertexGroupElements(PropCollection):
+    def __init__(self, weights):
+        self._init(_list=weights)
+
+    def _items(self):
+        return self._list
+
+    def _item(self, index):
+        return VertexGroupElement(self._list[index])
+
+class MeshVertex(RNA):
+    def __init__(self, mesh, index):
+        self._init(_mesh=mesh, _index=index)
+
+    index = property(lambda self: self._index)
+    co = property(lambda self: Vector(self._mesh._co[self._index * 3:self._index * 3 + 3]))
+    normal = property(lambda self: Vector(self._mesh._normals[self._index * 3:self._index * 3 + 3]))
+    groups = property(lambda self: VertexGroupElements(self._mesh._weights[self._index]))
+
+class MeshVertices(PropCollection):
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _length(self):
+        return len(self._mesh._co) // 3
+
+    def _item(self, index):
+        return MeshVertex(self._mesh, index)
+
+    def _column(self, attr):
+        if attr == "co":
+            return self._mesh._co
+        if attr == "normal":
+            return self._mesh._normals
+        return PropCollection._column(self, attr)
+
+    def _set_column(self, attr, values):
+        if attr != "co":
+            return PropCollection._set_column(self, attr, values)
+        self._mesh._co = array('f', values)
+
+    def add(self, count):
+        mesh = self._mesh
+        mesh._co.extend(array('f', [0.]) * (count * 3))
+        mesh._normals.extend(array('f', [0.]) * (count * 3))
+        mesh._weights.extend([] for n in range(count))
+
+class MeshLoop(RNA):
+    def __init__(self, mesh, index):
+        self._init(_mesh=mesh, _index=index)
+
+    index = property(lambda self: self._index)
+    vertex_index = property(lambda self: self._mesh._loop_vertices[self._index])
+
+class MeshLoops(PropCollection):
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _length(self):
+        return len(self._mesh._loop_vertices)
+
+    def _item(self, index):
+        return MeshLoop(self._mesh, index)
+
+    def _column(self, attr):
+        if attr == "vertex_index":
+            return self._mesh._loop_vertices
+        return PropCollection._column(self, attr)
+
+    def _set_column(self, attr, values):
+        self._mesh._loop_vertices = array('i', values)
+
+    def add(self, count):
+        mesh = self._mesh
+        mesh._loop_vertices.extend(array('i', [0]) * count)
+        for layer in mesh._uv_layers:
+            layer._uv.extend(array('f', [0.]) * (count * 2))
+
+polygon_columns = {
+    "loop_start": "_loop_starts",
+    "loop_total": "_loop_totals",
+    "material_index": "_polygon_materials",
+    }
+
+class MeshPolygon(RNA):
+    def __init__(self, mesh, index):
+        self._init(_mesh=mesh, _index=index)
+
+    index = property(lambda self: self._index)
+    loop_start = property(lambda self: self._mesh._loop_starts[self._index])
+    loop_total = property(lambda self: self._mesh._loop_totals[self._index])
+    material_index = property(lambda self: self._mesh._polygon_materials[self._index])
+
+class MeshPolygons(PropCollection):
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _length(self):
+        return len(self._mesh._loop_starts)
+
+    def _item(self, index):
+        return MeshPolygon(self._mesh, index)
+
+    def _column(self, attr):
+        if attr in polygon_columns:
+            return getattr(self._mesh, polygon_columns[attr])
+        return PropCollection._column(self, attr)
+
+    def _set_column(self, attr, values):
+        setattr(self._mesh, polygon_columns[attr], array('i', values))
+
+    def add(self, count):
+        mesh = self._mesh
+        for name in polygon_columns.values():
+            getattr(mesh, name).extend(array('i', [0]) * count)
+
+class MeshUVLoops(PropCollection):
+    def __init__(self, layer):
+        self._init(_layer=layer)
+
+    def _length(self):
+        return len(self._layer._uv) // 2
+
+    def _column(self, attr):
+        if attr == "uv":
+            return self._layer._uv
+        return PropCollection._column(self, attr)
+
+    def _set_column(self, attr, values):
+        self._layer._uv = array('f', values)
+
+class MeshUVLoopLayer(RNA):
+    def __init__(self, name, num_loops):
+        self._init(_name=name, _uv=array('f', [0.]) * (num_loops * 2))
+
+    name = property(lambda self: self._name)
+    data = property(lambda self: MeshUVLoops(self))
+
+class UVLoopLayers(PropCollection):
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _items(self):
+        return self._mesh._uv_layers
+
+    def new(self, name="UVMap", do_init=True):
+        mesh = self._mesh
+        layer = MeshUVLoopLayer(unique_name(name, mesh._uv_layers), len(mesh._loop_vertices))
+        mesh._uv_layers.append(layer)
+        if mesh._active_uv_layer is None:
+            mesh._active_uv_layer = layer
+        return layer
+
+    active = property(lambda self: self._mesh._active_uv_layer)
+
+loop_triangle_columns = {
+    "vertices": ("_triangle_vertices", 3),
+    "loops": ("_triangle_loops", 3),
+    "material_index": ("_triangle_materials", 1),
+    "polygon_index": ("_triangle_polygons", 1),
+    }
+
+class MeshLoopTriangle(RNA):
+    def __init__(self, mesh, index):
+        self._init(_mesh=mesh, _index=index)
+
+    index = property(lambda self: self._index)
+    vertices = property(lambda self: tuple(self._mesh._triangle_vertices[self._index * 3:self._index * 3 + 3]))
+    loops = property(lambda self: tuple(self._mesh._triangle_loops[self._index * 3:self._index * 3 + 3]))
+    material_index = property(lambda self: self._mesh._triangle_materials[self._index])
+    polygon_index = property(lambda self: self._mesh._triangle_polygons[self._index])
+
+    def _normal(self):
+        co = self._mesh._co
+        a, b, c = (vertex * 3 for vertex in self._mesh._triangle_vertices[self._index * 3:self._index * 3 + 3])
+        ux, uy, uz = co[b] - co[a], co[b + 1] - co[a + 1], co[b + 2] - co[a + 2]
+        vx, vy, vz = co[c] - co[a], co[c + 1] - co[a + 1], co[c + 2] - co[a + 2]
+        nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+        length = math.sqrt(nx * nx + ny * ny + nz * nz) or 1.
+        return Vector((nx / length, ny / length, nz / length))
+
+    normal = property(_normal)
+
+class MeshLoopTriangles(PropCollection):
+    # empty until calc_loop_triangles
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _length(self):
+        return len(self._mesh._triangle_materials)
+
+    def _item(self, index):
+        return MeshLoopTriangle(self._mesh, index)
+
+    def _column(self, attr):
+        if attr in loop_triangle_columns:
+            return getattr(self._mesh, loop_triangle_columns[attr][0])
+        return PropCollection._column(self, attr)
+
+class IDMaterials(PropCollection):
+    def __init__(self, mesh):
+        self._init(_mesh=mesh)
+
+    def _items(self):
+        return self._mesh._materials
+
+    def append(self, material):
+        self._mesh._materials.append(material)
+
+class Mesh(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_co=array('f'), _normals=array('f'), _weights=[],
+                   _loop_vertices=array('i'),
+                   _loop_starts=array('i'), _loop_totals=array('i'), _polygon_materials=array('i'),
+                   _uv_layers=[], _active_uv_layer=None, _materials=[], _freed=False)
+        self._clear_loop_triangles()
+
+    def __getattribute__(self, name):
+        if name[0] != "_" and object.__getattribute__(self, "_freed"):
+            raise ReferenceError("StructRNA of type Mesh has been removed")
+        return ID.__getattribute__(self, name)
+
+    vertices = property(lambda self: MeshVertices(self))
+    loops = property(lambda self: MeshLoops(self))
+    polygons = property(lambda self: MeshPolygons(self))
+    uv_layers = property(lambda self: UVLoopLayers(self))
+    materials = property(lambda self: IDMaterials(self))
+    loop_triangles = property(lambda self: MeshLoopTriangles(self))
+
+    def _clear_loop_triangles(self):
+        self._init(_triangle_vertices=array('i'), _triangle_loops=array('i'),
+                   _triangle_materials=array('i'), _triangle_polygons=array('i'))
+
+    def calc_loop_triangles(self):
+        # fan tessellation of every polygon
+        self._clear_loop_triangles()
+        loop_vertices = self._loop_vertices
+        for polygon, (start, total, material) in enumerate(zip(self._loop_starts, self._loop_totals,
+                                                                self._polygon_materials)):
+            for k in range(1, total - 1):
+                loops = (start, start + k, start + k + 1)
+                self._triangle_loops.extend(loops)
+                self._triangle_vertices.extend(loop_vertices[loop] for loop in loops)
+                self._triangle_materials.append(material)
+                self._triangle_polygons.append(polygon)
+
+    def _calc_normals(self):
+        # area weighted face normals summed on the vertices
+        co = self._co
+        normals = [0.] * len(co)
+        loop_vertices = self._loop_vertices
+        for start, total in zip(self._loop_starts, self._loop_totals):
+            corners = loop_vertices[start:start + total]
+            a = corners[0] * 3
+            for k in range(1, total - 1):
+                b = corners[k] * 3
+                c = corners[k + 1] * 3
+                ux, uy, uz = co[b] - co[a], co[b + 1] - co[a + 1], co[b + 2] - co[a + 2]
+                vx, vy, vz = co[c] - co[a], co[c + 1] - co[a + 1], co[c + 2] - co[a + 2]
+                nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+                for vertex in corners:
+                    normals[vertex * 3] += nx
+                    normals[vertex * 3 + 1] += ny
+                    normals[vertex * 3 + 2] += nz
+        for i in range(0, len(normals), 3):
+            length = math.sqrt(normals[i] ** 2 + normals[i + 1] ** 2 + normals[i + 2] ** 2)
+            if length:
+                normals[i] /= length
+                normals[i + 1] /= length
+                normals[i + 2] /= length
+        self._normals = array('f', normals)
+
+    def update(self, calc_edges=False, calc_edges_loose=False):
+        self._clear_loop_triangles()
+        self._calc_normals()
+
+    def _copy(self, name, num_polygons=None):
+        # the evaluated mesh of to_mesh, with only the first polygons when
+        # a decimate modifier is applied
+        mesh = Mesh(name)
+        mesh._init(_co=array('f', self._co), _normals=array('f', self._normals),
+                   _weights=[[list(weights) for weights in vertex] for vertex in self._weights],
+                   _materials=list(self._materials))
+        end = len(self._loop_starts) if num_polygons is None else num_polygons
+        num_loops = self._loop_starts[end - 1] + self._loop_totals[end - 1] if end else 0
+        mesh._init(_loop_vertices=self._loop_vertices[:num_loops],
+                   _loop_starts=self._loop_starts[:end], _loop_totals=self._loop_totals[:end],
+                   _polygon_materials=self._polygon_materials[:end])
+        for layer in self._uv_layers:
+            copy = MeshUVLoopLayer(layer._name, 0)
+            copy._uv = layer._uv[:num_loops * 2]
+            mesh._uv_layers.append(copy)
+            if layer is self._active_uv_layer:
+                mesh._active_uv_layer = copy
+        return mesh
+
+# objects
+
+class Modifier(RNA):
+    def __init__(self, name, type):
+        self._init(_name=name, _type=type, object=None, decimate_type='COLLAPSE', ratio=1.)
+
+    name = property(lambda self: self._name)
+    type = property(lambda self: self._type)
+
+class ObjectModifiers(PropCollection):
+    def __init__(self, object):
+        self._init(_object=object)
+
+    def _items(self):
+        return self._object._modifiers
+
+    def new(self, name, type):
+        modifier = Modifier(unique_name(name, self._object._modifiers), type)
+        self._object._modifiers.append(modifier)
+        return modifier
+
+    def remove(self, modifier):
+        self._object._modifiers.remove(modifier)
+
+class VertexGroup(RNA):
+    def __init__(self, object, name, index):
+        self._init(_object=object, _name=name, _index=index)
+
+    name = property(lambda self: self._name)
+    index = property(lambda self: self._index)
+
+    def add(self, index, weight, type):
+        weights = self._object._data._weights
+        for vertex in index:
+            for entry in weights[vertex]:
+                if entry[0] == self._index:
+                    entry[1] = entry[1] + weight if type == 'ADD' else weight
+                    break
+            else:
+                weights[vertex].append([self._index, weight])
+
+class VertexGroups(PropCollection):
+    def __init__(self, object):
+        self._init(_object=object)
+
+    def _items(self):
+        return self._object._vertex_groups
+
+    def new(self, name="Group"):
+        groups = self._object._vertex_groups
+        group = VertexGroup(self._object, unique_name(name, groups), len(groups))
+        groups.append(group)
+        return group
+
+class MaterialSlot(RNA):
+    def __init__(self, object, index):
+        self._init(_object=object, _index=index)
+
+    def _set_material(self, material):
+        self._object._data._materials[self._index] = material
+
+    material = property(lambda self: self._object._data._materials[self._index], _set_material)
+    name = property(lambda self: (self._object._data._materials[self._index] or ID(""))._name)
+
+class MaterialSlots(PropCollection):
+    def __init__(self, object):
+        self._init(_object=object)
+
+    def _length(self):
+        data = self._object._data
+        return len(data._materials) if isinstance(data, Mesh) else 0
+
+    def _item(self, index):
+        return MaterialSlot(self._object, index)
+
+class AnimData(RNA):
+    def __init__(self):
+        self._init(action=None)
+
+class PoseBone(RNA):
+    def __init__(self, bone):
+        self._init(_name=bone._name, _bone=bone, rotation_mode='QUATERNION')
+
+    name = property(lambda self: self._name)
+    bone = property(lambda self: self._bone)
+
+    def path_from_id(self, property=""):
+        path = 'pose.bones["%s"]' % self._name.replace("\\", "\\\\").replace('"', '\\"')
+        return path + "." + property if property else path
+
+class PoseBones(PropCollection):
+    def __init__(self, pose):
+        self._init(_pose=pose)
+
+    def _items(self):
+        return self._pose._bones()
+
+class Pose(RNA):
+    def __init__(self, object):
+        self._init(_object=object, _pose_bones={})
+
+    def _bones(self):
+        # kept per name like Blender keeps the pose channels
+        pose_bones = self._pose_bones
+        bones = []
+        for bone in self._object._data._bones:
+            pose_bone = pose_bones.get(bone._name)
+            if pose_bone is None or pose_bone._bone is not bone:
+                pose_bone = pose_bones[bone._name] = PoseBone(bone)
+            bones.append(pose_bone)
+        return bones
+
+    bones = property(lambda self: PoseBones(self))
+
+class Object(ID):
+    def __init__(self, name, data=None):
+        ID.__init__(self, name)
+        if isinstance(data, Mesh):
+            type = 'MESH'
+        elif isinstance(data, Armature):
+            type = 'ARMATURE'
+        else:
+            type = 'EMPTY'
+        self._init(_data=data, _type=type, _modifiers=[], _vertex_groups=[], _select=False,
+                   _pose=None, _temporary_mesh=None,
+                   parent=None, matrix_basis=Matrix.Identity(4), animation_data=None)
+
+    data = property(lambda self: self._data)
+    type = property(lambda self: self._type)
+    modifiers = property(lambda self: ObjectModifiers(self))
+    vertex_groups = property(lambda self: VertexGroups(self))
+    material_slots = property(lambda self: MaterialSlots(self))
+    original = property(lambda self: self)
+
+    def _get_pose(self):
+        if self._type != 'ARMATURE':
+            return None
+        if self._pose is None:
+            self._pose = Pose(self)
+        return self._pose
+
+    pose = property(_get_pose)
+
+    def select_get(self):
+        return self._select
+
+    def select_set(self, state):
+        self._select = state
+
+    def animation_data_create(self):
+        if peek(self, "animation_data") is None:
+            self._init(animation_data=AnimData())
+        return peek(self, "animation_data")
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    def to_mesh(self, preserve_all_data_layers=False, depsgraph=None):
+        self._free_temporary_mesh()
+        num_polygons = None
+        for modifier in self._modifiers:
+            if modifier._type == 'DECIMATE':
+                total = len(self._data._loop_starts) if num_polygons is None else num_polygons
+                num_polygons = int(math.ceil(total * peek(modifier, "ratio")))
+        self._temporary_mesh = self._data._copy(self._name, num_polygons)
+        return self._temporary_mesh
+
+    def _free_temporary_mesh(self):
+        if self._temporary_mesh is not None:
+            self._temporary_mesh._freed = True
+            self._temporary_mesh = None
+
+    def to_mesh_clear(self):
+        self._free_temporary_mesh()
+
+# armatures
+
+class Bone(RNA):
+    def __init__(self, name, parent, matrix_local, length):
+        self._init(_name=name, parent=parent, matrix_local=matrix_local, length=length)
+
+    name = property(lambda self: self._name)
+
+class ArmatureBones(PropCollection):
+    def __init__(self, armature):
+        self._init(_armature=armature)
+
+    def _items(self):
+        return self._armature._bones
+
+class EditBone(RNA):
+    def __init__(self, name):
+        self._init(_name=name, _matrix=Matrix.Identity(4), _length=1., parent=None)
+
+    name = property(lambda self: self._name)
+
+    def _set_length(self, length):
+        self._length = float(length)
+
+    def _set_matrix(self, matrix):
+        self._matrix = matrix.copy()
+
+    length = property(lambda self: self._length, _set_length)
+    matrix = property(lambda self: self._matrix.copy(), _set_matrix)
+
+class ArmatureEditBones(PropCollection):
+    def __init__(self, armature):
+        self._init(_armature=armature)
+
+    def _items(self):
+        return self._armature._edit_bones
+
+    def new(self, name):
+        bones = self._armature._edit_bones
+        bone = EditBone(unique_name(name, bones))
+        bones.append(bone)
+        return bone
+
+    def remove(self, bone):
+        self._armature._edit_bones.remove(bone)
+
+class Armature(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_edit_bones=[], _bones=[])
+
+    edit_bones = property(lambda self: ArmatureEditBones(self))
+    bones = property(lambda self: ArmatureBones(self))
+
+    def _edit_to_bones(self):
+        bones = {}
+        for edit_bone in self._edit_bones:
+            parent = peek(edit_bone, "parent")
+            bones[edit_bone._name] = Bone(edit_bone._name, None if parent is None else parent._name,
+                                          edit_bone._matrix.copy(), edit_bone._length)
+        for bone in bones.values():
+            bone._init(parent=bones.get(peek(bone, "parent")))
+        self._bones = list(bones.values())
+
+    def _bones_to_edit(self):
+        edit_bones = {}
+        for bone in self._bones:
+            edit_bone = edit_bones[bone._name] = EditBone(bone._name)
+            edit_bone._init(_matrix=peek(bone, "matrix_local").copy(), _length=peek(bone, "length"))
+        for bone in self._bones:
+            parent = peek(bone, "parent")
+            edit_bones[bone._name]._init(parent=None if parent is None else edit_bones[parent._name])
+        self._edit_bones = list(edit_bones.values())
+
+# actions
+
+# the interpolation enum of keyframes, foreach_get and foreach_set use the
+# indices
+interpolation_types = ('CONSTANT', 'LINEAR', 'BEZIER')
+
+class Keyframe(RNA):
+    def __init__(self, fcurve, index):
+        self._init(_fcurve=fcurve, _index=index)
+
+    co = property(lambda self: Vector(self._fcurve._co[self._index * 2:self._index * 2 + 2]))
+    interpolation = property(lambda self: interpolation_types[self._fcurve._interpolation[self._index]])
+
+class FCurveKeyframePoints(PropCollection):
+    def __init__(self, fcurve):
+        self._init(_fcurve=fcurve)
+
+    def _length(self):
+        return len(self._fcurve._co) // 2
+
+    def _item(self, index):
+        return Keyframe(self._fcurve, index)
+
+    def _column(self, attr):
+        if attr == "co":
+            return self._fcurve._co
+        if attr == "interpolation":
+            return self._fcurve._interpolation
+        return PropCollection._column(self, attr)
+
+    def _set_column(self, attr, values):
+        if attr == "co":
+            self._fcurve._co = array('f', values)
+        elif attr == "interpolation":
+            self._fcurve._interpolation = array('i', values)
+        else:
+            PropCollection._set_column(self, attr, values)
+
+    def add(self, count=1):
+        # bezier like blender, whatever the preferences
+        self._fcurve._co.extend(array('f', [0.]) * (count * 2))
+        self._fcurve._interpolation.extend(array('i', [2]) * count)
+
+    def insert(self, frame, value, options=set(), keyframe_type='KEYFRAME'):
+        self._fcurve._co.extend(array('f', (frame, value)))
+        self._fcurve._interpolation.append(2)
+        self._fcurve._sort()
+        return Keyframe(self._fcurve, self._fcurve._find(frame))
+
+class FCurve(RNA):
+    def __init__(self, data_path, array_index):
+        self._init(_data_path=data_path, _array_index=array_index, _co=array('f'), _interpolation=array('i'))
+
+    data_path = property(lambda self: self._data_path)
+    array_index = property(lambda self: self._array_index)
+    keyframe_points = property(lambda self: FCurveKeyframePoints(self))
+
+    def _sort(self):
+        co = self._co
+        keys = sorted(zip(co[0::2], co[1::2], self._interpolation), key=lambda key: key[0])
+        self._co = array('f', [value for key in keys for value in key[0:2]])
+        self._interpolation = array('i', [key[2] for key in keys])
+
+    def _find(self, frame):
+        return list(self._co[0::2]).index(frame)
+
+    def update(self):
+        self._sort()
+
+class ActionFCurves(PropCollection):
+    def __init__(self, action):
+        self._init(_action=action)
+
+    def _items(self):
+        return self._action._fcurves
+
+    def _find(self, data_path, index):
+        for fcurve in self._action._fcurves:
+            if fcurve._data_path == data_path and fcurve._array_index == index:
+                return fcurve
+        return None
+
+    def find(self, data_path, index=0):
+        return self._find(data_path, index)
+
+    def new(self, data_path, index=0, action_group=""):
+        if self._find(data_path, index) is not None:
+            raise RuntimeError("Error: F-Curve '%s[%i]' already exists in action '%s'" %
+                               (data_path, index, self._action._name))
+        fcurve = FCurve(data_path, index)
+        self._action._fcurves.append(fcurve)
+        return fcurve
+
+class Action(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_fcurves=[])
+
+    fcurves = property(lambda self: ActionFCurves(self))
+
+# scene
+
+class CollectionObjects(PropCollection):
+    def __init__(self, collection):
+        self._init(_collection=collection)
+
+    def _items(self):
+        return self._collection._objects
+
+    def link(self, object):
+        self._collection._objects.append(object)
+        context._objects.append(object)
+
+class Collection(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_objects=[])
+
+    objects = property(lambda self: CollectionObjects(self))
+
+class RenderSettings(RNA):
+    def __init__(self):
+        self._init(fps=24)
+
+class Scene(ID):
+    def __init__(self, name):
+        ID.__init__(self, name)
+        self._init(_render=RenderSettings(), frame_start=1, frame_end=250, frame_current=1)
+
+    render = property(lambda self: self._render)
+
+    def frame_set(self, frame, subframe=0.):
+        self._init(frame_current=int(frame))
+
+class LayerObjects(PropCollection):
+    def __init__(self, context):
+        self._init(_context=context)
+
+    def _items(self):
+        return self._context._objects
+
+    def _set_active(self, object):
+        self._context._active = object
+
+    active = property(lambda self: self._context._active, _set_active)
+
+class ViewLayer(RNA):
+    def __init__(self, context):
+        self._init(_context=context)
+
+    objects = property(lambda self: LayerObjects(self._context))
+
+class DepsgraphObjectInstance(RNA):
+    def __init__(self, object):
+        self._init(_object=object)
+
+    object = property(lambda self: self._object)
+    parent = property(lambda self: None)
+    is_instance = property(lambda self: False)
+
+class Depsgraph(RNA):
+    def __init__(self, context):
+        self._init(_context=context)
+
+    def _instances(self):
+        for object in list(self._context._objects):
+            count("Depsgraph.object_instances[]")
+            yield DepsgraphObjectInstance(object)
+
+    object_instances = property(_instances)
+
+    def update(self):
+        pass
+
+class BlendData(RNA):
+    def __init__(self):
+        self._init(_meshes=BlendDataMeshes(Mesh), _objects=BlendDataObjects(Object),
+                   _materials=BlendDataMaterials(Material), _images=BlendDataImages(Image),
+                   _actions=BlendDataActions(Action), _armatures=BlendDataArmatures(Armature),
+                   _collections=BlendDataCollections(Collection))
+        self._collections._add("Collection")
+
+    meshes = property(lambda self: self._meshes)
+    objects = property(lambda self: self._objects)
+    materials = property(lambda self: self._materials)
+    images = property(lambda self: self._images)
+    actions = property(lambda self: self._actions)
+    armatures = property(lambda self: self._armatures)
+    collections = property(lambda self: self._collections)
+
+class Context(RNA):
+    def __init__(self, data):
+        self._init(_data=data, _scene=Scene("Scene"), _objects=[], _active=None, _mode='OBJECT')
+        self._init(_view_layer=ViewLayer(self))
+
+    scene = property(lambda self: self._scene)
+    view_layer = property(lambda self: self._view_layer)
+    blend_data = property(lambda self: self._data)
+    object = property(lambda self: self._active)
+    active_object = property(lambda self: self._active)
+    mode = property(lambda self: self._mode)
+    selected_objects = property(lambda self: [object for object in self._objects if object._select])
+
+    def evaluated_depsgraph_get(self):
+        return Depsgraph(self)
+
+class OpsObject(RNA):
+    def mode_set(self, mode='OBJECT', toggle=False):
+        object = context._active
+        if object is None:
+            raise RuntimeError("Operator bpy.ops.object.mode_set.poll() failed, context is incorrect")
+        if object._type == 'ARMATURE':
+            if mode == 'EDIT' and context._mode != 'EDIT':
+                object._data._bones_to_edit()
+            elif mode != 'EDIT' and context._mode == 'EDIT':
+                object._data._edit_to_bones()
+        context._mode = mode
+        return {'FINISHED'}
+
+class Ops(RNA):
+    def __init__(self):
+        self._init(_object=OpsObject())
+
+    object = property(lambda self: self._object)
+
+# modules
+
+def clean_name(name, replace="_"):
+    return "".join(c if c.isalnum() or c in "-_." else replace for c in name)
+
+data = None
+context = None
+
+def reset():
+    # an empty scene with its default collection
+    global data, context
+    data = BlendData()
+    context = Context(data)
+    bpy = sys.modules["bpy"]
+    bpy.data = data
+    bpy.context = context
+    calls.clear()
+
+def install():
+    # the addon modules keep the bpy they imported, installing again only
+    # empties the scene
+    existing = sys.modules.get("bpy")
+    if existing is not None:
+        if not getattr(existing, "_fake", False):
+            raise RuntimeError("bpy is already imported, the fakes only run under plain Python")
+        reset()
+        return
+    bpy = types.ModuleType("bpy")
+    bpy._fake = True
+    bpy.ops = Ops()
+    bpy.path = types.SimpleNamespace(clean_name=clean_name)
+    bpy.app = types.SimpleNamespace(version=(2, 82, 0), binary_path_python=sys.executable)
+    mathutils = types.ModuleType("mathutils")
+    mathutils.Vector = Vector
+    mathutils.Matrix = Matrix
+    mathutils.Euler = Euler
+    mathutils.Quaternion = Quaternion
+    sys.modules["bpy"] = bpy
+    sys.modules["mathutils"] = mathutils
+    reset()
+
+def leaked_meshes():
+    # meshes of to_mesh never released with to_mesh_clear
+    return sum(1 for object in data._objects._list if object._temporary_mesh is not None)
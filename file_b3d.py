@@ -0,0 +1,120 @@
+# loading and saving models in any of the supported formats
+
+import os
+
+from io_scene_b3d.parse_b3d import (
+    load_b3d,
+    )
+from io_scene_b3d.parallel_b3d import (
+    load_b3d_parallel,
+    )
+from io_scene_b3d.write_b3d import (
+    encode_chunks,
+    save_b3d,
+    serialize_animations,
+    serialize_bones,
+    serialize_materials,
+    serialize_object,
+    serialize_triangles,
+    serialize_vertices,
+    )
+from io_scene_b3d.binary_b3d import (
+    animation_sections,
+    is_b3db,
+    load_b3db,
+    material_sections,
+    mesh_sections,
+    pack_sections,
+    save_b3db,
+    skeleton_sections,
+    write_packed,
+    )
+from io_scene_b3d.compress_b3d import (
+    compression_extensions,
+    default_level,
+    file_compression,
+    open_b3d,
+    strip_compression,
+    )
+
+if os.name == 'nt':
+    together_models = os.path.join(os.environ['USERPROFILE'], "Documents/Together/test/assets/model/")
+else:
+    together_models =  os.path.expanduser("~/Documents/Together/test/assets/model/")
+
+format_extensions = {
+    'TEXT': ".b3d",
+    'BINARY': ".b3db",
+    }
+
+def detect_format(b3d):
+    if is_b3db(b3d):
+        return 'BINARY'
+    else:
+        return 'TEXT'
+
+def load_model(b3d, format='AUTO', sections=None, parallel=False):
+    # sections and parallel only matter for text files, binary sections are
+    # views that cost nothing until they are read
+    if format == 'AUTO':
+        format = detect_format(b3d)
+    if format == 'BINARY':
+        return load_b3db(b3d)
+    elif parallel and sections is None:
+        return load_b3d_parallel(b3d)
+    else:
+        return load_b3d(b3d, sections=sections)
+
+def save_model(b3d, model, format='TEXT', level=default_level, index=False):
+    # binary files always have a table of contents
+    if format == 'BINARY':
+        save_b3db(b3d, model, level)
+    else:
+        save_b3d(b3d, model, level, index)
+
+# serialized sections are handled in chunks that can be produced once and
+# shared between files or cached between exports. text chunks are strings
+# and binary chunks lists of packed sections
+
+chunk_groups = ('mesh', 'materials', 'skeleton', 'animations')
+
+def serialize_chunk(model, group, format='TEXT'):
+    if format == 'BINARY':
+        if group == 'mesh':
+            sections = mesh_sections(model)
+        elif group == 'materials':
+            sections = material_sections(model)
+        elif group == 'skeleton':
+            sections = skeleton_sections(model)
+        else:
+            sections = animation_sections(model)
+        return pack_sections(sections)
+    else:
+        if group == 'mesh':
+            return serialize_object(model) + serialize_vertices(model) + serialize_triangles(model)
+        elif group == 'materials':
+            return serialize_materials(model)
+        elif group == 'skeleton':
+            return serialize_bones(model)
+        else:
+            return serialize_animations(model)
+
+def save_chunks(b3d, chunks, format='TEXT', level=default_level, index=False):
+    # chunks in chunk_groups order
+    if format == 'BINARY':
+        with open_b3d(b3d, "wb", level) as file:
+            write_packed(file, [section for chunk in chunks for section in chunk])
+    elif index:
+        with open_b3d(b3d, "wb", level) as file:
+            for chunk in encode_chunks(chunks, index):
+                file.write(chunk)
+    else:
+        with open_b3d(b3d, "w", level) as file:
+            for chunk in chunks:
+                file.write(chunk)
+
+def replace_extension(b3d, format, compression=None):
+    # keeps the compression unless given, _Idle.b3d.gz becomes _Idle.b3db.gz
+    if compression is None:
+        compression = file_compression(b3d)
+    return os.path.splitext(strip_compression(b3d))[0] + format_extensions[format] + compression_extensions[compression]
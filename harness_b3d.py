@@ -0,0 +1,255 @@
+# runs the real import_b3d and export_b3d on synthetic scenes under plain
+# CPython and counts their Blender API calls
+#
+#   python -m io_scene_b3d.harness_b3d [--vertices N] [--triangles N]
+#                                      [--materials N] [--bones N]
+#                                      [--keyframes N] [--animations N]
+#                                      [--scale S] [--json FILE]
+#                                      [--compare FILE] [--max-increase R]
+#
+# bpy and mathutils are replaced by the fakes of fake_b3d, so this
+# must not run inside Blender. every stage (import, export, import of the
+# animations only) is run on the scene of the options and on one S times
+# bigger, the difference of the calls between the two divided by the
+# difference of the elements (vertices, triangles, bones and keyframes) is
+# the number of calls each element costs, whatever the fixed cost of the
+# stage. --compare loads the JSON of an earlier run and fails when the
+# calls per element of a stage grew by more than --max-increase, listing
+# the calls that grew. the export is also imported and exported again and
+# both exports must match within the diff_b3d tolerances. the rna_calls
+# the addon counts itself are checked against the calls the fakes counted
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+import datetime
+
+from io_scene_b3d import (
+    fake_b3d,
+    )
+from io_scene_b3d.bench_b3d import (
+    generate_model,
+    )
+from io_scene_b3d.diff_b3d import (
+    diff_b3d,
+    )
+from io_scene_b3d.file_b3d import (
+    save_model,
+    )
+
+class Operator:
+    # collects what the addon reports
+    def __init__(self):
+        self.reports = []
+
+    def __repr__(self):
+        return "Operator(%i reports)" % len(self.reports)
+
+    def report(self, type, message):
+        self.reports.append((sorted(type), message))
+
+    def errors(self):
+        return [message for type, message in self.reports if 'ERROR' in type]
+
+def addon_modules():
+    # imported once the fakes are installed
+    fake_b3d.install()
+    from io_scene_b3d import import_b3d, export_b3d
+    return import_b3d, export_b3d
+
+def run_stage(name, function, elements, log_path):
+    # function takes the operator and the log path of the stats
+    operator = Operator()
+    leaked_meshes = fake_b3d.leaked_meshes()
+    fake_b3d.calls.clear()
+    if os.path.exists(log_path):
+        os.remove(log_path)
+    start_time = datetime.datetime.now()
+    function(operator, log_path)
+    elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+    errors = operator.errors()
+    if errors:
+        raise RuntimeError("%s failed: %s" % (name, "; ".join(errors)))
+    with open(log_path, "r", encoding="utf-8") as file:
+        reported = json.loads(file.readlines()[-1])["counters"].get("rna_calls", 0)
+    return {
+        "calls": sum(fake_b3d.calls.values()),
+        "reported_calls": reported,
+        "elements": elements,
+        "seconds": elapsed_time,
+        "leaked_meshes": fake_b3d.leaked_meshes() - leaked_meshes,
+        "keys": dict(fake_b3d.calls),
+        }
+
+def count_elements(model):
+    keys = sum(len(track.locations) // 4 + len(track.rotations) // 4
+               for animation in model.animations for track in animation.tracks)
+    return model.num_vertices + model.num_triangles + model.num_bones + keys
+
+def run_scene(config, directory, round_trip=False):
+    import_b3d, export_b3d = addon_modules()
+    model = generate_model(**config)
+    elements = count_elements(model)
+    source = os.path.join(directory, "source.b3d")
+    exported = os.path.join(directory, "exported.b3d")
+    log_path = os.path.join(directory, "stats.jsonl")
+    save_model(source, model, 'TEXT')
+
+    def clear_session():
+        fake_b3d.reset()
+        import_b3d.loaded_images.clear()
+        import_b3d.loaded_materials.clear()
+
+    clear_session()
+    stages = {}
+    stages["import"] = run_stage("import", lambda operator, log_path: import_b3d.import_b3d(
+        operator, source, log_path=log_path), elements, log_path)
+    stages["export"] = run_stage("export", lambda operator, log_path: export_b3d.export_b3d(
+        operator, exported, log_path=log_path), elements, log_path)
+    # onto the armature of the imported scene
+    with fake_b3d.uncounted():
+        armature_object = fake_b3d.context.object.parent
+        fake_b3d.context.view_layer.objects.active = armature_object
+    stages["import_animations"] = run_stage("import_animations", lambda operator, log_path: import_b3d.import_animations(
+        operator, source, log_path=log_path), elements, log_path)
+
+    report = {"stages": stages}
+    if round_trip:
+        # export -> import -> export gives the same file
+        reexported = os.path.join(directory, "reexported.b3d")
+        clear_session()
+        run_stage("import", lambda operator, log_path: import_b3d.import_b3d(
+            operator, exported, log_path=log_path), elements, log_path)
+        run_stage("export", lambda operator, log_path: export_b3d.export_b3d(
+            operator, reexported, log_path=log_path), elements, log_path)
+        report["round_trip"] = diff_b3d(exported, reexported)
+    return report
+
+def marginal_calls(small, large):
+    # calls per element from the difference between the two scenes, for
+    # every stage and every call
+    stages = {}
+    for name, stage in small["stages"].items():
+        other = large["stages"][name]
+        elements = max(other["elements"] - stage["elements"], 1)
+        keys = {}
+        for key in set(stage["keys"]) | set(other["keys"]):
+            delta = other["keys"].get(key, 0) - stage["keys"].get(key, 0)
+            if delta:
+                keys[key] = delta / elements
+        stages[name] = {
+            "calls": stage["calls"],
+            "calls_large": other["calls"],
+            "reported_calls": stage["reported_calls"],
+            "reported_calls_large": other["reported_calls"],
+            "elements": stage["elements"],
+            "elements_large": other["elements"],
+            "per_element": (other["calls"] - stage["calls"]) / elements,
+            "seconds": stage["seconds"],
+            "seconds_large": other["seconds"],
+            "leaked_meshes": stage["leaked_meshes"],
+            "keys": keys,
+            }
+    return stages
+
+def compare_stages(stages, baseline, max_increase):
+    # stages whose calls per element grew, with the calls that grew
+    regressions = []
+    for name, stage in stages.items():
+        reference = baseline.get("stages", {}).get(name)
+        if reference is None:
+            continue
+        limit = reference["per_element"] * (1. + max_increase) + 1e-9
+        print("%-18s %10.3f vs %10.3f calls per element" % (name, stage["per_element"], reference["per_element"]))
+        if stage["per_element"] > limit:
+            grown = sorted(((value - reference["keys"].get(key, 0.), key) for key, value in stage["keys"].items()
+                            if value > reference["keys"].get(key, 0.) + 1e-9), reverse=True)
+            regressions.append((name, grown))
+    return regressions
+
+def scaled_config(config, scale):
+    scaled = dict(config)
+    for name in ("vertices", "triangles", "bones", "keyframes"):
+        scaled[name] = int(round(config[name] * scale))
+    return scaled
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m io_scene_b3d.harness_b3d",
+                                     description="Count the Blender API calls of import and export on synthetic scenes")
+    parser.add_argument("--vertices", type=int, default=2000)
+    parser.add_argument("--triangles", type=int, default=4000)
+    parser.add_argument("--materials", type=int, default=2)
+    parser.add_argument("--bones", type=int, default=20)
+    parser.add_argument("--keyframes", type=int, default=50)
+    parser.add_argument("--animations", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scale", type=float, default=2., help="size of the second scene against the first")
+    parser.add_argument("--top", type=int, default=8, help="calls listed per stage")
+    parser.add_argument("--json", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON of an earlier run to compare against")
+    parser.add_argument("--max-increase", type=float, default=0.,
+                        help="allowed growth of the calls per element against --compare, 0.1 is 10%%")
+    args = parser.parse_args(argv)
+    if args.scale <= 1.:
+        parser.error("--scale must be over 1")
+
+    config = {
+        "vertices": args.vertices,
+        "triangles": args.triangles,
+        "materials": args.materials,
+        "bones": args.bones,
+        "keyframes": args.keyframes,
+        "animations": args.animations,
+        "seed": args.seed,
+        }
+    with tempfile.TemporaryDirectory() as directory:
+        small = run_scene(config, directory, round_trip=True)
+        large = run_scene(scaled_config(config, args.scale), directory)
+    stages = marginal_calls(small, large)
+    round_trip = small["round_trip"]
+
+    for name, stage in stages.items():
+        print("%-18s %8i calls %8i elements %10.3f calls per element %8.3fs%s" %
+              (name, stage["calls"], stage["elements"], stage["per_element"], stage["seconds"],
+               " %i leaked meshes" % stage["leaked_meshes"] if stage["leaked_meshes"] else ""))
+        for key, value in sorted(stage["keys"].items(), key=lambda item: -item[1])[:args.top]:
+            print("    %-40s %10.3f" % (key, value))
+    print("Round trip", "equal" if round_trip["equal"] else "differs")
+    for message in round_trip["structure"]:
+        print("  ", message)
+    for name, section in round_trip["sections"].items():
+        for entry in section["first"]:
+            print("  ", name, entry["row"], entry["column"], entry["values"])
+
+    status = 0 if round_trip["equal"] else 1
+    for name, stage in stages.items():
+        for suffix in ("", "_large"):
+            if stage["reported_calls" + suffix] != stage["calls" + suffix]:
+                print("Miscounted: %s reports %i rna_calls of %i" %
+                      (name, stage["reported_calls" + suffix], stage["calls" + suffix]))
+                status = 1
+    if args.json:
+        report = {
+            "config": config,
+            "scale": args.scale,
+            "stages": stages,
+            "round_trip": round_trip["equal"],
+            }
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as file:
+            baseline = json.load(file)
+        regressions = compare_stages(stages, baseline, args.max_increase)
+        for name, grown in regressions:
+            print("Regressed:", name)
+            for delta, key in grown[:args.top]:
+                print("    %-40s +%.3f" % (key, delta))
+        if regressions:
+            status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
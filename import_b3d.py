@@ -1,127 +1,273 @@
 import bpy
 import os
 import sys
-import ast
 import math
 import mathutils
-import datetime
 
-def import_b3d(operator, b3d):
-    dirname = os.path.dirname(b3d)
-    with open(b3d, "r", encoding="utf-8", newline="\n") as file:
-        def rline():
-            return file.readline()
-        
-        def rliteral():
-            return ast.literal_eval(file.readline())
-        
-        start_time = datetime.datetime.now()
-        
-        context = bpy.context
-        scene = context.scene
-        
-        # name
-        rline()
-        info = rliteral()
-        name = info[0]
-        
-        scene.render.fps = info[1]
-        scene.frame_start = info[2]
-        scene.frame_end = info[3]
-        scene.frame_set(info[4])
-        
-        vertices_info = []
-        triangles_info = []
-        materials_info = []
-        
-        # vertices
-        rline()
-        rline()
-        num_vertices = rliteral()
-        for n in range(0, num_vertices):
-            vert = rliteral()
-            vertices_info.append(vert)
-        
-        # triangles
-        rline()
-        rline()
-        num_triangles = rliteral()
-        for n in range(0, num_triangles):
-            tri = rliteral()
-            triangles_info.append(tri)
+from array import array
+
+from io_scene_b3d.file_b3d import (
+    load_model,
+    )
+from io_scene_b3d.stats_b3d import (
+    Stats,
+    )
+
+# images and materials loaded during the session, so textures shared by
+# several models are only decoded once
+loaded_images = {}
+loaded_materials = {}
+
+def cached_datablock(cache, key, collection, stats):
+    datablock = cache.get(key)
+    if datablock is not None:
+        stats.count("rna_calls", 2)
+        try:
+            if collection.get(datablock.name) == datablock:
+                return datablock
+        except ReferenceError:
+            # removed since it was cached
+            pass
+        del cache[key]
+    return None
+
+def load_image(filepath, reuse_existing=True, stats=None):
+    if stats is None:
+        stats = Stats("Loaded")
+    filepath = os.path.abspath(filepath)
+    key = os.path.normcase(filepath)
+    image = None
+    if reuse_existing:
+        image = cached_datablock(loaded_images, key, bpy.data.images, stats)
+        stats.count("rna_calls")
+    if image is None:
+        image = bpy.data.images.load(filepath, check_existing=reuse_existing)
+        stats.count("rna_calls", 2)
+        loaded_images[key] = image
+        stats.count("images")
+    return image
+
+def load_material(name, dirname, texture, reuse_existing=True, stats=None):
+    if stats is None:
+        stats = Stats("Loaded")
+    key = (name, os.path.normcase(os.path.abspath(os.path.join(dirname, texture))) if texture else "")
+    mat = None
+    if reuse_existing:
+        mat = cached_datablock(loaded_materials, key, bpy.data.materials, stats)
+        stats.count("rna_calls")
+    if mat is None:
+        mat = bpy.data.materials.new(name=name)
+        mat.use_nodes = True
+        mat_nodes = mat.node_tree.nodes
+        mat_links = mat.node_tree.links
+        output = mat_nodes['Material Output']
+        principled = mat_nodes['Principled BSDF']
+        stats.count("rna_calls", 9)
         
-        # materials
-        rline()
-        rline()
-        num_materials = rliteral()
-        for n in range(0, num_materials):
-            mat = rliteral()
-            materials_info.append(mat)
+        # the exporter writes "" for materials without an image texture
+        if texture:
+            teximg = mat_nodes.new('ShaderNodeTexImage')
+            with stats.phase("images"):
+                teximg.image = load_image(os.path.join(dirname, texture), reuse_existing, stats)
+            
+            mat_links.new(teximg.outputs['Color'], principled.inputs['Base Color'])
+            stats.count("rna_calls", 7)
         
+        loaded_materials[key] = mat
+    return mat
+
+def add_keyframes(action, data_path, keys, stats):
+    # keys are flat time, x, y, z columns. keyframe_points.add gives bezier
+    # keys, they are made linear since the game interpolates linearly
+    # between keys and the keyframe reduction of export relies on it.
+    # update then sorts the keys
+    num_keys = len(keys) // 4
+    co = [0.] * (num_keys * 2)
+    co[0::2] = keys[0::4]
+    # LINEAR in the interpolation enum of keyframes
+    interpolation = array('i', [1]) * num_keys
+    for index in range(3):
+        co[1::2] = keys[index + 1::4]
+        fcurve = action.fcurves.new(data_path, index=index)
+        fcurve.keyframe_points.add(num_keys)
+        fcurve.keyframe_points.foreach_set("co", array('f', co))
+        fcurve.keyframe_points.foreach_set("interpolation", interpolation)
+        fcurve.update()
+        stats.count("rna_calls", 9)
+    stats.count("keyframes", num_keys * 3)
+
+def add_action(armature_object, animation, stats):
+    action = bpy.data.actions.new(animation.name)
+    armature_object.animation_data_create()
+    armature_object.animation_data.action = action
+    stats.count("rna_calls", 5)
+    for track in animation.tracks:
+        pose_bone = armature_object.pose.bones.get(track.bone_name)
+        pose_bone.rotation_mode = 'XZY'
+        stats.count("rna_calls", 4)
+        if track.locations:
+            data_path = pose_bone.path_from_id('location')
+            stats.count("rna_calls")
+            add_keyframes(action, data_path, track.locations, stats)
+        if track.rotations:
+            data_path = pose_bone.path_from_id('rotation_euler')
+            stats.count("rna_calls")
+            add_keyframes(action, data_path, track.rotations, stats)
+    return action
+
+def target_armature(context, stats):
+    # the active armature, or the armature of the active mesh
+    object = context.object
+    stats.count("rna_calls")
+    if object is not None:
+        stats.count("rna_calls")
+        if object.type != 'ARMATURE':
+            object = object.parent
+            stats.count("rna_calls")
+            if object is not None:
+                stats.count("rna_calls")
+                if object.type != 'ARMATURE':
+                    return None
+    return object
+
+def import_animations(operator, b3d, format='AUTO', log_path=None):
+    # only the actions of the file, added to the active armature. the mesh,
+    # materials and vertex groups are skipped and the bones only checked
+    stats = Stats("Imported animations of", b3d)
+    
+    armature_object = target_armature(bpy.context, stats)
+    if armature_object is None:
+        operator.report({'ERROR'}, 'No active armature to import the animations onto')
+        return []
+    
+    with stats.phase("parse"):
+        model = load_model(b3d, format, sections={"BONES", "ANIMATIONS"})
+    
+    bones = armature_object.data.bones
+    missing = [name for name in model.bone_names if bones.get(name) is None]
+    stats.count("rna_calls", 2 + model.num_bones)
+    if missing:
+        operator.report({'ERROR'}, '%s has bones not in %s: %s' %
+                        (os.path.basename(b3d), armature_object.name, ", ".join(missing[:5])))
+        return []
+    
+    if not model.animations:
+        operator.report({'WARNING'}, 'No animations in %s' % os.path.basename(b3d))
+    
+    actions = []
+    with stats.phase("animations"):
+        for animation in model.animations:
+            action = add_action(armature_object, animation, stats)
+            # keep every action when the file is saved, only the last one
+            # stays assigned
+            action.use_fake_user = True
+            stats.count("rna_calls")
+            actions.append(action)
+    stats.count("actions", len(actions))
+    
+    # report
+    operator.report({'INFO'}, stats.summary())
+    stats.write_log(log_path)
+    print(stats.summary())
+    return actions
+
+def import_b3d(operator, b3d, format='AUTO', reuse_existing=True, log_path=None, parallel=False):
+    dirname = os.path.dirname(b3d)
+    stats = Stats("Imported", b3d)
+    
+    # before 2.91 sys.executable is blender itself, the spawned parse
+    # workers would start blender instead of python so the file is parsed
+    # serially
+    python_path = getattr(bpy.app, "binary_path_python", None)
+    if python_path and os.path.realpath(python_path) != os.path.realpath(sys.executable):
+        parallel = False
+    with stats.phase("parse"):
+        model = load_model(b3d, format, parallel=parallel)
+    
+    context = bpy.context
+    scene = context.scene
+    
+    # name
+    name = model.name
+    
+    scene.render.fps = model.fps
+    scene.frame_start = model.frame_start
+    scene.frame_end = model.frame_end
+    scene.frame_set(model.frame_current)
+    stats.count("rna_calls", 6)
+    
+    num_vertices = model.num_vertices
+    num_materials = len(model.materials)
+    
+    # mesh
+    with stats.phase("mesh"):
         mesh = bpy.data.meshes.new(name)
         obj = bpy.data.objects.new(mesh.name, mesh)
         col = bpy.data.collections.get("Collection")
+        stats.count("rna_calls", 7)
 
-        verts = list(map(lambda vert: (vert[0], vert[1], vert[2]), vertices_info))
-        edges = []
-        faces = list(map(lambda tri: (tri[0], tri[1], tri[2]), triangles_info))
-
-        mesh.from_pydata(verts, [], faces)
-        
+        num_triangles = model.num_triangles
+        num_loops = num_triangles * 3
+        mesh.vertices.add(num_vertices)
+        mesh.vertices.foreach_set("co", array('f', model.positions))
+        mesh.loops.add(num_loops)
+        mesh.loops.foreach_set("vertex_index", array('i', model.triangles))
+        stats.count("rna_calls", 8)
+        mesh.polygons.add(num_triangles)
+        mesh.polygons.foreach_set("loop_start", array('i', range(0, num_loops, 3)))
+        mesh.polygons.foreach_set("loop_total", array('i', [3]) * num_triangles)
+        # assigning -1 to material_index clamps to 0 but foreach_set does not clamp
+        mesh.polygons.foreach_set("material_index", array('i', [mat if mat > 0 else 0 for mat in model.triangle_materials]))
+        mesh.update(calc_edges=True)
+        stats.count("rna_calls", 9)
+    stats.count("vertices", num_vertices)
+    stats.count("triangles", num_triangles)
+    
+    with stats.phase("uvs"):
         uv_layer = mesh.uv_layers.new(name='UVMap', do_init=False)
-        uv_loops = uv_layer.data
-        
-        for n in range(len(mesh.polygons)):
-            poly = mesh.polygons[n]
-            tri_info = triangles_info[n]
-            poly.material_index = tri_info[3]
-            uv_loops[poly.loop_start].uv = (tri_info[4], 1.0 - tri_info[5])
-            uv_loops[poly.loop_start + 1].uv = (tri_info[6], 1.0 - tri_info[7])
-            uv_loops[poly.loop_start + 2].uv = (tri_info[8], 1.0 - tri_info[9])
-        
-        col.objects.link(obj)
-        context.view_layer.objects.active = obj
+        uvs = array('f', model.uvs)
+        uvs[1::2] = array('f', [1.0 - v for v in model.uvs[1::2]])
+        uv_layer.data.foreach_set("uv", uvs)
+        stats.count("rna_calls", 4)
+    
+    col.objects.link(obj)
+    context.view_layer.objects.active = obj
+    stats.count("rna_calls", 5)
 
+    with stats.phase("materials"):
         for n in range(num_materials):
-            mat_info = materials_info[n]
-            mat = bpy.data.materials.new(name=mat_info[0])
-            mat.use_nodes = True
-            mat_nodes = mat.node_tree.nodes
-            mat_links = mat.node_tree.links
-            output = mat_nodes['Material Output']
-            principled = mat_nodes['Principled BSDF']
-            
-            teximg = mat_nodes.new('ShaderNodeTexImage')
-            teximg.image = bpy.data.images.load(dirname + "/" + mat_info[1])
-            
-            mat_links.new(teximg.outputs['Color'], principled.inputs['Base Color'])
-            
+            mat_info = model.materials[n]
+            mat = load_material(mat_info[0], dirname, mat_info[1], reuse_existing, stats)
             mesh.materials.append(mat)
             obj.material_slots[-1].material = mat
+            stats.count("rna_calls", 5)
+    stats.count("materials", num_materials)
+    
+    # bones
+    num_bones = model.num_bones
+    if num_bones > 0:
+        armature_name = 'Armature'
+        armature = context.blend_data.armatures.new(armature_name)
+        armature_object = context.blend_data.objects.new(armature_name, armature)
+        col.objects.link(armature_object)
+        modifier = obj.modifiers.new(armature_name, type='ARMATURE')
+        modifier.object = armature_object
+        obj.parent = armature_object
         
-        # bones
-        rline()
-        rline()
-        num_bones = rliteral()
-        if num_bones > 0:
-            armature_name = 'Armature'
-            armature = context.blend_data.armatures.new(armature_name)
-            armature_object = context.blend_data.objects.new(armature_name, armature)
-            col.objects.link(armature_object)
-            modifier = obj.modifiers.new(armature_name, type='ARMATURE')
-            modifier.object = armature_object
-            obj.parent = armature_object
-            
-            context.view_layer.objects.active = armature_object
-            bpy.ops.object.mode_set(mode = 'EDIT')
+        context.view_layer.objects.active = armature_object
+        bpy.ops.object.mode_set(mode = 'EDIT')
+        stats.count("rna_calls", 17)
+        bone_transforms = model.bone_transforms
+        with stats.phase("armature"):
             for n in range(num_bones):
-                bone_info = rliteral()
-                bone_name = bone_info[0]
-                bone_parent_name = bone_info[1]
-                bone_position = (bone_info[2], bone_info[3], bone_info[4])
-                bone_rotation = (bone_info[5], bone_info[6], bone_info[7])
-                bone_length = bone_info[8]
+                bone_name = model.bone_names[n]
+                bone_parent_name = model.bone_parents[n]
+                bone_info = bone_transforms[n * 7:n * 7 + 7]
+                bone_position = (bone_info[0], bone_info[1], bone_info[2])
+                bone_rotation = (bone_info[3], bone_info[4], bone_info[5])
+                bone_length = bone_info[6]
                 edit_bone = armature.edit_bones.new(bone_name)
+                stats.count("rna_calls", 2)
                 translation_matrix = mathutils.Matrix.Translation(bone_position)
                 rotation_matrix = mathutils.Euler(bone_rotation, 'XYZ').to_matrix().to_4x4()
                 matrix = translation_matrix @ rotation_matrix
@@ -132,71 +278,44 @@ def import_b3d(operator, b3d):
                     parent = armature.edit_bones.get(bone_parent_name);
                     edit_bone.parent = parent
                     matrix = parent.matrix @ matrix
+                    stats.count("rna_calls", 4)
                 edit_bone.length = bone_length
                 edit_bone.matrix = matrix
-                
-                vertex_group = obj.vertex_groups.new(name=bone_name)
-                for i in range(num_vertices):
-                    vert_info = vertices_info[i]
-                    vert_bone = vert_info[6]
-                    if vert_bone == n:
-                        vertex_group.add((i,), 1., 'ADD')
-            bpy.ops.object.mode_set(mode = 'OBJECT')
-    
-            # animations
-            rline()
-            rline()
-            num_animations = rliteral()
-            bpy.ops.object.mode_set(mode = 'POSE')
-            for n in range(num_animations):
-                animation_info = rliteral()
-                animation_name = animation_info
-                action = bpy.data.actions.new(animation_name)
-                armature_object.animation_data_create()
-                armature_object.animation_data.action = action
-                for i in range(num_bones):
-                    bone_name = rliteral()
-                    pose_bone = armature_object.pose.bones.get(bone_name)
-                    pose_bone.rotation_mode = 'XZY'
-                    num_locations = rliteral()
-                    if num_locations > 0:
-                        data_path = pose_bone.path_from_id('location')
-                        fcurve_location_x = action.fcurves.new(data_path, index=0)
-                        fcurve_location_y = action.fcurves.new(data_path, index=1)
-                        fcurve_location_z = action.fcurves.new(data_path, index=2)
-                        for j in range(num_locations):
-                            keyframe_info = rliteral()
-                            frame = keyframe_info[0]
-                            x = keyframe_info[1]
-                            y = keyframe_info[2]
-                            z = keyframe_info[3]
-                            fcurve_location_x.keyframe_points.insert(frame, x)
-                            fcurve_location_y.keyframe_points.insert(frame, y)
-                            fcurve_location_z.keyframe_points.insert(frame, z)
-                    num_rotations = rliteral()
-                    if num_rotations > 0:
-                        data_path = pose_bone.path_from_id('rotation_euler')
-                        fcurve_rotation_euler_x = action.fcurves.new(data_path, index=0)
-                        fcurve_rotation_euler_y = action.fcurves.new(data_path, index=1)
-                        fcurve_rotation_euler_z = action.fcurves.new(data_path, index=2)
-                        for j in range(num_rotations):
-                            keyframe_info = rliteral()
-                            frame = keyframe_info[0]
-                            x = keyframe_info[1]
-                            y = keyframe_info[2]
-                            z = keyframe_info[3]
-                            fcurve_rotation_euler_x.keyframe_points.insert(frame, x)
-                            fcurve_rotation_euler_y.keyframe_points.insert(frame, y)
-                            fcurve_rotation_euler_z.keyframe_points.insert(frame, z)
-            bpy.ops.object.mode_set(mode = 'OBJECT')
-        
-        # select
-        context.view_layer.objects.active = obj
-        for object in bpy.context.selected_objects:
-            if object is not obj:
-                object.select_set(False)
-        obj.select_set(True)
-        
-        # report
-        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
-        print("Imported", "in", elapsed_time)
+                stats.count("rna_calls", 2)
+        stats.count("bones", num_bones)
+        with stats.phase("vertex_groups"):
+            # vertex indices of each bone, gathered in a single pass
+            bone_vertices = [[] for n in range(num_bones)]
+            for i, vert_bone in enumerate(model.vertex_bones):
+                if 0 <= vert_bone < num_bones:
+                    bone_vertices[vert_bone].append(i)
+            for n in range(num_bones):
+                vertex_group = obj.vertex_groups.new(name=model.bone_names[n])
+                stats.count("rna_calls", 2)
+                if bone_vertices[n]:
+                    vertex_group.add(bone_vertices[n], 1., 'ADD')
+                    stats.count("rna_calls")
+        bpy.ops.object.mode_set(mode = 'OBJECT')
+
+        # animations
+        bpy.ops.object.mode_set(mode = 'POSE')
+        with stats.phase("animations"):
+            for animation in model.animations:
+                add_action(armature_object, animation, stats)
+        bpy.ops.object.mode_set(mode = 'OBJECT')
+        stats.count("rna_calls", 6)
+    
+    # select
+    context.view_layer.objects.active = obj
+    stats.count("rna_calls", 4)
+    for object in bpy.context.selected_objects:
+        if object is not obj:
+            object.select_set(False)
+            stats.count("rna_calls")
+    obj.select_set(True)
+    stats.count("rna_calls")
+    
+    # report
+    operator.report({'INFO'}, stats.summary())
+    stats.write_log(log_path)
+    print(stats.summary())
@@ -0,0 +1,334 @@
+# streaming inspector of .b3d and .b3db files that runs without Blender
+#
+#   python -m io_scene_b3d.inspect_b3d [--json] path ...
+#
+# text files are read in a single pass in blocks of rows so memory stays
+# constant whatever the size of the file, binary files through the views of
+# their table of contents. the report has the section counts and byte
+# sizes, the bounding box, the bone hierarchy depth, the keyframes of
+# every bone, the frame range and the referenced textures, and lists the
+# problems found (indices out of range, unknown bones). directories are
+# walked for .b3d and .b3db files, compressed or not. the exit code is 1
+# when a file has problems or cannot be read
+
+import os
+import sys
+import json
+import datetime
+
+from io_scene_b3d.parse_b3d import (
+    parse_line,
+    split_tokens,
+    )
+from io_scene_b3d.binary_b3d import (
+    is_b3db,
+    load_b3db,
+    read_toc,
+    )
+from io_scene_b3d.compress_b3d import (
+    open_b3d,
+    strip_compression,
+    )
+from io_scene_b3d.file_b3d import (
+    format_extensions,
+    )
+
+block_rows = 16384
+
+max_problems = 20
+
+class Inspection:
+    def __init__(self, path):
+        self.path = path
+        self.report = {
+            "file": path,
+            "format": "TEXT",
+            "size": os.path.getsize(path),
+            "sections": {},
+            "problems": [],
+            }
+        self.bounds = None
+        self.num_problems = 0
+
+    def __repr__(self):
+        return "Inspection(%s)" % self.path
+
+    def problem(self, message):
+        self.num_problems += 1
+        if self.num_problems <= max_problems:
+            self.report["problems"].append(message)
+
+    def section(self, name, count, size):
+        self.report["sections"][name] = {"count": count, "bytes": size}
+
+    def object(self, name, fps, frame_start, frame_end, frame_current):
+        self.report["object"] = name
+        self.report["fps"] = fps
+        self.report["frame_range"] = [frame_start, frame_end]
+        self.report["frame_current"] = frame_current
+
+    def positions(self, xs, ys, zs):
+        if not xs:
+            return
+        low = [min(xs), min(ys), min(zs)]
+        high = [max(xs), max(ys), max(zs)]
+        if self.bounds is not None:
+            low = [min(a, b) for a, b in zip(low, self.bounds[0])]
+            high = [max(a, b) for a, b in zip(high, self.bounds[1])]
+        self.bounds = (low, high)
+
+    def vertex_bones(self, bones, num_bones):
+        if bones and (max(bones) >= num_bones or min(bones) < -1):
+            self.problem("vertex bone index out of range")
+
+    def triangles(self, indices, materials, num_vertices, num_materials):
+        if indices and (max(indices) >= num_vertices or min(indices) < 0):
+            self.problem("triangle vertex index out of range")
+        if materials and (max(materials) >= num_materials or min(materials) < -1):
+            self.problem("triangle material index out of range")
+
+    def materials(self, materials):
+        self.report["textures"] = sorted(set(texture for name, texture in materials if texture))
+
+    def bones(self, names, parents):
+        depths = {}
+        for name, parent in zip(names, parents):
+            if parent == "":
+                depths[name] = 1
+            elif parent in depths:
+                depths[name] = depths[parent] + 1
+            else:
+                self.problem("bone %s has unknown parent %s" % (name, parent))
+                depths[name] = 1
+        self.report["bone_depth"] = max(depths.values()) if depths else 0
+        self.report["root_bones"] = [name for name, parent in zip(names, parents) if parent == ""]
+        self.bone_names = set(names)
+
+    def animation(self, name, tracks, time_range):
+        # tracks are (bone name, number of locations, number of rotations)
+        for bone_name, num_locations, num_rotations in tracks:
+            if bone_name not in self.bone_names:
+                self.problem("animation %s has a track for unknown bone %s" % (name, bone_name))
+        self.report.setdefault("animations", []).append({
+            "name": name,
+            "keyframes": sum(l + r for b, l, r in tracks),
+            "time_range": time_range,
+            "tracks": {bone_name: [num_locations, num_rotations] for bone_name, num_locations, num_rotations in tracks},
+            })
+
+    def finish(self):
+        self.report["bounding_box"] = self.bounds
+        self.report.setdefault("animations", [])
+        if self.num_problems > max_problems:
+            self.report["problems"].append("%i more problems" % (self.num_problems - max_problems))
+        return self.report
+
+def inspect_text(file, inspection):
+    position = 0
+    def rline():
+        nonlocal position
+        line = file.readline()
+        position += len(line)
+        return line
+
+    def rliteral():
+        return parse_line(rline().decode("utf-8"))
+
+    def rsection(name, optional=False):
+        # byte offset of the header and the count
+        start = position
+        line = rline()
+        while line and not line.strip():
+            start = position
+            line = rline()
+        if optional and line == b"":
+            return start, 0
+        if line.strip() != name.encode("ascii"):
+            raise ValueError("Expected %s section, found %r" % (name, line))
+        if name == "OBJECT":
+            return start, None
+        return start, rliteral()
+
+    def rblocks(count, width):
+        # lists of columns of bytes tokens, block by block
+        for first in range(0, count, block_rows):
+            lines = [rline() for n in range(min(block_rows, count - first))]
+            tokens = split_tokens(lines, width)
+            if tokens is None:
+                # row by row as the importer reads them, the columns then
+                # hold the parsed values
+                tokens = []
+                for line in lines:
+                    row = parse_line(line.decode("utf-8"))
+                    if not isinstance(row, tuple) or len(row) != width:
+                        raise ValueError("Expected %i values per row in %r" % (width, line))
+                    tokens.extend(row)
+            yield [tokens[k::width] for k in range(width)]
+
+    starts = {}
+    counts = {}
+
+    starts["OBJECT"], count = rsection("OBJECT")
+    info = rliteral()
+    inspection.object(*info[0:5])
+    counts["OBJECT"] = 1
+
+    starts["VERTICES"], num_vertices = rsection("VERTICES")
+    counts["VERTICES"] = num_vertices
+    vertex_blocks = []
+    for columns in rblocks(num_vertices, 7):
+        inspection.positions(list(map(float, columns[0])), list(map(float, columns[1])), list(map(float, columns[2])))
+        bones = list(map(int, columns[6]))
+        vertex_blocks.append((min(bones, default=-1), max(bones, default=-1)))
+
+    starts["TRIANGLES"], num_triangles = rsection("TRIANGLES")
+    counts["TRIANGLES"] = num_triangles
+    triangle_blocks = []
+    for columns in rblocks(num_triangles, 10):
+        indices = list(map(int, columns[0])) + list(map(int, columns[1])) + list(map(int, columns[2]))
+        triangle_blocks.append((min(indices, default=0), max(indices, default=0),
+                                min(map(int, columns[3]), default=0), max(map(int, columns[3]), default=0)))
+
+    starts["MATERIALS"], num_materials = rsection("MATERIALS")
+    counts["MATERIALS"] = num_materials
+    materials = [rliteral()[0:2] for n in range(num_materials)]
+    inspection.materials(materials)
+
+    starts["BONES"], num_bones = rsection("BONES")
+    counts["BONES"] = num_bones
+    names = []
+    parents = []
+    for n in range(num_bones):
+        bone_info = rliteral()
+        names.append(bone_info[0])
+        parents.append(bone_info[1])
+    inspection.bones(names, parents)
+
+    # the indices are checked once the counts they refer to are known, only
+    # the extremes of every block are kept
+    for low, high in vertex_blocks:
+        inspection.vertex_bones((low, high), num_bones)
+    for low, high, low_material, high_material in triangle_blocks:
+        inspection.triangles((low, high), (low_material, high_material), num_vertices, num_materials)
+
+    starts["ANIMATIONS"], num_animations = rsection("ANIMATIONS", optional=True)
+    counts["ANIMATIONS"] = num_animations
+    for n in range(num_animations):
+        name = rliteral()
+        tracks = []
+        low = high = None
+        for i in range(num_bones):
+            bone_name = rliteral()
+            runs = []
+            for k in range(2):
+                num_keys = rliteral()
+                for columns in rblocks(num_keys, 4):
+                    times = list(map(float, columns[0]))
+                    if times:
+                        low = min(times) if low is None else min(low, min(times))
+                        high = max(times) if high is None else max(high, max(times))
+                runs.append(num_keys)
+            tracks.append((bone_name, runs[0], runs[1]))
+        inspection.animation(name, tracks, None if low is None else [low, high])
+
+    # whatever follows, the empty tracks after a zero count and the index
+    end = position
+    while rline():
+        pass
+    ordered = sorted(starts.items(), key=lambda item: item[1])
+    for (name, start), (next_name, next_start) in zip(ordered, ordered[1:] + [("", end)]):
+        inspection.section(name, counts[name], next_start - start)
+    if position > end:
+        inspection.section("TRAILER", None, position - end)
+
+def inspect_binary(path, inspection):
+    inspection.report["format"] = "BINARY"
+    model = load_b3db(path)
+    inspection.object(model.name, model.fps, model.frame_start, model.frame_end, model.frame_current)
+    with open_b3d(path, "rb") as file:
+        toc = read_toc(file.read(65536))
+    for tag, (kind, width, count, offset, size) in toc.items():
+        inspection.section(tag.decode("ascii"), count, size)
+    positions = model.positions
+    for first in range(0, model.num_vertices * 3, block_rows * 3):
+        block = positions[first:first + block_rows * 3]
+        inspection.positions(block[0::3], block[1::3], block[2::3])
+    inspection.vertex_bones(model.vertex_bones, model.num_bones)
+    inspection.triangles(model.triangles, model.triangle_materials, model.num_vertices, len(model.materials))
+    inspection.materials(model.materials)
+    inspection.bones(model.bone_names, model.bone_parents)
+    for animation in model.animations:
+        times = [time for track in animation.tracks for keys in (track.locations, track.rotations) for time in keys[0::4]]
+        tracks = [(track.bone_name, len(track.locations) // 4, len(track.rotations) // 4) for track in animation.tracks]
+        inspection.animation(animation.name, tracks, [min(times), max(times)] if times else None)
+
+def inspect_b3d(path):
+    inspection = Inspection(path)
+    if is_b3db(path):
+        inspect_binary(path, inspection)
+    else:
+        with open_b3d(path, "rb") as file:
+            inspect_text(file, inspection)
+    return inspection.finish()
+
+def collect_files(paths):
+    extensions = tuple(format_extensions.values())
+    for path in paths:
+        if os.path.isdir(path):
+            for dirpath, dirnames, filenames in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if strip_compression(filename).endswith(extensions):
+                        yield os.path.join(dirpath, filename)
+        else:
+            yield path
+
+def print_report(report):
+    print(report["file"])
+    if "error" in report:
+        print("  error", report["error"])
+        return
+    print("  object %s, %s fps, frames %s" % (report["object"], report["fps"], report["frame_range"]))
+    for name, section in report["sections"].items():
+        print("  %-10s %10s %12i bytes" % (name, "" if section["count"] is None else section["count"], section["bytes"]))
+    print("  bounding box", report["bounding_box"])
+    print("  bone depth", report["bone_depth"], "roots", ", ".join(report["root_bones"]))
+    for animation in report["animations"]:
+        print("  animation %s, %i keyframes, times %s" % (animation["name"], animation["keyframes"], animation["time_range"]))
+    for texture in report["textures"]:
+        print("  texture", texture)
+    for problem in report["problems"]:
+        print("  problem", problem)
+
+def main(argv):
+    as_json = "--json" in argv
+    paths = [arg for arg in argv if arg != "--json"]
+    if not paths:
+        print("usage: python -m io_scene_b3d.inspect_b3d [--json] path ...")
+        return 2
+    status = 0
+    num_files = 0
+    reports = []
+    start_time = datetime.datetime.now()
+    for path in collect_files(paths):
+        num_files += 1
+        try:
+            report = inspect_b3d(path)
+        except (OSError, ValueError, SyntaxError, IndexError, TypeError) as exception:
+            report = {"file": path, "error": str(exception)}
+        if "error" in report or report["problems"]:
+            status = 1
+        if as_json:
+            reports.append(report)
+        else:
+            print_report(report)
+    if as_json:
+        json.dump(reports, sys.stdout, indent=2)
+        print()
+    else:
+        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+        print("Inspected", num_files, "files in", elapsed_time)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,182 @@
+# in-memory form of a .b3d file
+#
+# this module has no bpy dependency so it can be used from plain CPython
+
+# vertices are stored as flat columns
+#   positions: x, y, z per vertex
+#   normals: x, y, z per vertex
+#   vertex_bones: bone index per vertex (-1 when unweighted)
+#
+# triangles are stored as flat columns
+#   triangles: v1, v2, v3 per triangle
+#   triangle_materials: material index per triangle (-1 when no material)
+#   uvs: u1, v1, u2, v2, u3, v3 per triangle as written in the file
+#
+# bones are stored as
+#   bone_names, bone_parents: one string per bone ("" for roots)
+#   bone_transforms: px, py, pz, rx, ry, rz, length per bone
+#
+# keyframes are stored as flat columns of time, x, y, z per key
+#
+# numeric columns are typed arrays, 'd' for floats and 'i' for integers,
+# so a model takes about the size of its raw data instead of a boxed
+# python object per value. assigning a list or any other sequence to a
+# column converts it, arrays and memoryviews (the zero-copy views of the
+# binary reader) are kept as they are
+
+from array import array
+
+# kinds of the numeric columns of the file, 'f' float and 'i' integer,
+# with the conversion of their text and the array type of their column
+column_converters = {
+    'f': float,
+    'i': int,
+    }
+
+column_typecodes = {
+    'f': 'd',
+    'i': 'i',
+    }
+
+def interleave(*columns):
+    # typed when every column is an array of the same type, a list otherwise
+    width = len(columns)
+    typecodes = set(getattr(column, "typecode", None) for column in columns)
+    if len(typecodes) == 1 and None not in typecodes:
+        flat = array(typecodes.pop(), bytes(columns[0].itemsize * len(columns[0]) * width))
+    else:
+        flat = [None] * (len(columns[0]) * width)
+    for k, column in enumerate(columns):
+        flat[k::width] = column
+    return flat
+
+
+class Column:
+    def __init__(self, typecode):
+        self.typecode = typecode
+
+    def __set_name__(self, owner, name):
+        self.slot = "_" + name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        return getattr(instance, self.slot)
+
+    def __set__(self, instance, values):
+        if not isinstance(values, (array, memoryview)):
+            values = array(self.typecode, values)
+        setattr(instance, self.slot, values)
+
+
+class B3DTrack:
+    __slots__ = ("bone_name", "_locations", "_rotations")
+
+    locations = Column('d')
+    rotations = Column('d')
+
+    def __init__(self, bone_name, locations=None, rotations=None):
+        self.bone_name = bone_name
+        self.locations = () if locations is None else locations
+        self.rotations = () if rotations is None else rotations
+
+    def __repr__(self):
+        return "B3DTrack(%s)" % self.bone_name
+
+
+class B3DAnimation:
+    __slots__ = ("name", "tracks")
+
+    def __init__(self, name, tracks=None):
+        self.name = name
+        self.tracks = [] if tracks is None else tracks
+
+    def __repr__(self):
+        return "B3DAnimation(%s)" % self.name
+
+
+class B3DModel:
+    __slots__ = ("name", "fps", "frame_start", "frame_end", "frame_current",
+                 "_positions", "_normals", "_vertex_bones",
+                 "_triangles", "_triangle_materials", "_uvs",
+                 "materials", "bone_names", "bone_parents", "_bone_transforms",
+                 "animations")
+
+    positions = Column('d')
+    normals = Column('d')
+    vertex_bones = Column('i')
+    triangles = Column('i')
+    triangle_materials = Column('i')
+    uvs = Column('d')
+    bone_transforms = Column('d')
+
+    def __init__(self, name=""):
+        self.name = name
+        self.fps = 0.
+        self.frame_start = 0.
+        self.frame_end = 0.
+        self.frame_current = 0.
+        self.positions = ()
+        self.normals = ()
+        self.vertex_bones = ()
+        self.triangles = ()
+        self.triangle_materials = ()
+        self.uvs = ()
+        self.materials = []
+        self.bone_names = []
+        self.bone_parents = []
+        self.bone_transforms = ()
+        self.animations = []
+
+    def __repr__(self):
+        return "B3DModel(%s)" % self.name
+
+    @property
+    def num_vertices(self):
+        return len(self.vertex_bones)
+
+    @property
+    def num_triangles(self):
+        return len(self.triangle_materials)
+
+    @property
+    def num_bones(self):
+        return len(self.bone_names)
+
+
+def values_match(values, other, tolerance=0.):
+    if len(values) != len(other):
+        return False
+    if tolerance == 0.:
+        return list(values) == list(other)
+    for a, b in zip(values, other):
+        if a != b and abs(a - b) > tolerance * max(1., abs(a)):
+            return False
+    return True
+
+def compare_models(model, other, tolerance=0.):
+    # name of the first attribute that differs or None
+    for attr in ("name", "materials", "bone_names", "bone_parents"):
+        if list(getattr(model, attr)) != list(getattr(other, attr)):
+            return attr
+    for attr in ("fps", "frame_start", "frame_end", "frame_current"):
+        if not values_match((getattr(model, attr),), (getattr(other, attr),), tolerance):
+            return attr
+    for attr in ("positions", "normals", "vertex_bones",
+                 "triangles", "triangle_materials", "uvs",
+                 "bone_transforms"):
+        if not values_match(getattr(model, attr), getattr(other, attr), tolerance):
+            return attr
+    if len(model.animations) != len(other.animations):
+        return "animations"
+    for animation, other_animation in zip(model.animations, other.animations):
+        if animation.name != other_animation.name or len(animation.tracks) != len(other_animation.tracks):
+            return "animations"
+        for track, other_track in zip(animation.tracks, other_animation.tracks):
+            if track.bone_name != other_track.bone_name:
+                return "animations"
+            if not values_match(track.locations, other_track.locations, tolerance):
+                return "animations"
+            if not values_match(track.rotations, other_track.rotations, tolerance):
+                return "animations"
+    return None
@@ -0,0 +1,237 @@
+import bpy
+import os
+
+from bpy.utils import (
+    register_class,
+    unregister_class,
+    )
+from bpy_extras.io_utils import (
+    ExportHelper,
+    ImportHelper,
+    )
+from bpy.props import (
+    BoolProperty,
+    CollectionProperty,
+    EnumProperty,
+    FloatProperty,
+    IntProperty,
+    StringProperty,
+    )
+from bpy.types import (
+    Operator,
+    OperatorFileListElement,
+    TOPBAR_MT_file_export,
+    TOPBAR_MT_file_import,
+    )
+from io_scene_b3d.import_b3d import (
+    import_animations,
+    import_b3d,
+    )
+from io_scene_b3d.export_b3d import (
+    export_b3d,
+    )
+from io_scene_b3d.file_b3d import (
+    replace_extension,
+    together_models,
+    )
+from io_scene_b3d.compress_b3d import (
+    default_level,
+    )
+
+# register
+def register():
+    classes = ( HandleImport, HandleExport )
+    for c in classes:
+        bpy.utils.register_class(c)
+
+    bpy.types.TOPBAR_MT_file_import.append(HandleImport.menu_func)
+    bpy.types.TOPBAR_MT_file_export.append(HandleExport.menu_func)
+
+def unregister():
+    classes = ( HandleImport, HandleExport )
+    for c in reversed(classes):
+        bpy.utils.unregister_class(c)
+
+    bpy.types.TOPBAR_MT_file_import.remove(HandleImport.menu_func)
+    bpy.types.TOPBAR_MT_file_export.remove(HandleExport.menu_func)
+
+# import
+class HandleImport(Operator, ImportHelper):
+
+    bl_idname = "import.b3d"
+    bl_label = "Import B3D"
+    bl_description = "Import from B3D format (.b3d)"
+
+    filename_ext = ".b3d"
+    filter_glob : StringProperty(default="*.b3d;*.b3db;*.b3d.gz;*.b3db.gz;*.b3d.xz;*.b3db.xz", options={'HIDDEN'})
+    format : EnumProperty(
+        name="Format",
+        items=(('AUTO', "Auto", "Detect the format from the file contents"),
+               ('TEXT', "Text", "Text .b3d"),
+               ('BINARY', "Binary", "Binary .b3db")),
+        default='AUTO')
+    files : CollectionProperty(type=OperatorFileListElement, options={'HIDDEN', 'SKIP_SAVE'})
+    directory : StringProperty(subtype='DIR_PATH', options={'HIDDEN', 'SKIP_SAVE'})
+    mode : EnumProperty(
+        name="Mode",
+        items=(('MODEL', "Model", "Import the mesh, materials, armature and animations"),
+               ('ANIMATIONS', "Animations Only", "Add the animations of every file as actions of the active armature")),
+        default='MODEL')
+    reuse_existing : BoolProperty(
+        name="Reuse Existing",
+        description="Reuse images and materials already loaded instead of creating duplicates",
+        default=True)
+    parallel : BoolProperty(
+        name="Parallel Parsing",
+        description="Parse large text files with a pool of worker processes from Blender 2.91 on, small files are parsed serially",
+        default=False)
+    log_path : StringProperty(
+        name="Log File",
+        description="Append the timings and counters of every import as a JSON line to this file",
+        default="", subtype='FILE_PATH')
+
+    @staticmethod
+    def menu_func(self, context):
+        self.layout.operator(HandleImport.bl_idname, text="B3D Format (.b3d)")
+
+    def execute(self, context):
+        if self.files and self.directory:
+            filepaths = [os.path.join(self.directory, file.name) for file in self.files if file.name]
+        else:
+            filepaths = [self.filepath]
+        if self.mode == 'ANIMATIONS':
+            actions = []
+            for filepath in filepaths:
+                actions.extend(import_animations(self, filepath, self.format, self.log_path))
+            # every file without actions has reported why
+            return {'FINISHED'} if actions else {'CANCELLED'}
+        for filepath in filepaths:
+            import_b3d(self, filepath, self.format, self.reuse_existing, self.log_path, self.parallel)
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        self.filepath = together_models
+        context.window_manager.fileselect_add(self)
+        return {'RUNNING_MODAL'}
+
+# export
+class HandleExport(Operator, ExportHelper):
+
+    bl_idname = "export.b3d"
+    bl_label = "Export B3D"
+    bl_description = "Export to B3D format (.b3d)"
+
+    filename_ext = ".b3d"
+    filter_glob : StringProperty(default="*.b3d;*.b3db;*.b3d.gz;*.b3db.gz;*.b3d.xz;*.b3db.xz", options={'HIDDEN'})
+    format : EnumProperty(
+        name="Format",
+        items=(('TEXT', "Text", "Text .b3d"),
+               ('BINARY', "Binary", "Binary .b3db")),
+        default='TEXT')
+    all_actions : BoolProperty(
+        name="All Actions",
+        description="Export every action of the armature to its own file (_<action>.b3d) next to the chosen path",
+        default=False)
+    use_cache : BoolProperty(
+        name="Use Cache",
+        description="Reuse unchanged sections and leave unchanged files untouched, using a cache in the model directory",
+        default=True)
+    invalidate_cache : BoolProperty(
+        name="Invalidate Cache",
+        description="Discard the cache and export everything",
+        default=False)
+    cache_size : IntProperty(
+        name="Cache Size (MB)",
+        description="Maximum size of the cached sections",
+        default=64, min=1)
+    log_path : StringProperty(
+        name="Log File",
+        description="Append the timings and counters of every export as a JSON line to this file",
+        default="", subtype='FILE_PATH')
+    compression : EnumProperty(
+        name="Compression",
+        items=(('NONE', "None", "Uncompressed"),
+               ('GZIP', "Gzip", "Gzip compressed (.gz)"),
+               ('XZ', "XZ", "XZ compressed (.xz), smaller but slower")),
+        default='NONE')
+    compression_level : IntProperty(
+        name="Compression Level",
+        description="Higher is smaller but slower",
+        default=default_level, min=0, max=9)
+    reduce_keyframes : BoolProperty(
+        name="Reduce Keyframes",
+        description="Drop keyframes that linear interpolation rebuilds within the tolerances",
+        default=False)
+    position_tolerance : FloatProperty(
+        name="Position Tolerance",
+        description="Largest distance a dropped location key may be off by",
+        default=0.001, min=0., precision=4, subtype='DISTANCE')
+    angle_tolerance : FloatProperty(
+        name="Angle Tolerance",
+        description="Largest angle a dropped rotation key may be off by",
+        default=0.001745, min=0., precision=4, subtype='ANGLE')
+    optimize_vertex_cache : BoolProperty(
+        name="Optimize Vertex Cache",
+        description="Reorder triangles for the GPU vertex cache and renumber vertices in first use order",
+        default=False)
+    lod_ratios : StringProperty(
+        name="LOD Ratios",
+        description="Triangle ratios of the levels of detail written next to the export as _Idle.lod1.b3d and so on, "
+                    "for example 0.5, 0.25",
+        default="")
+    write_index : BoolProperty(
+        name="Write Index",
+        description="End text files with the byte offset of every section so readers can seek to or skip them",
+        default=False)
+    
+    @staticmethod
+    def menu_func(self, context):
+        default_path = bpy.data.filepath.replace(".blend", ".b3d")
+        opts = self.layout.operator(HandleExport.bl_idname, text="B3D Format (.b3d)")
+        opts.filepath = default_path
+
+    def execute(self, context):
+        try:
+            lod_ratios = [float(ratio) for ratio in self.lod_ratios.replace(",", " ").split()]
+        except ValueError:
+            lod_ratios = None
+        if lod_ratios is None or not all(0. < ratio < 1. for ratio in lod_ratios):
+            self.report({'ERROR'}, 'LOD ratios must be numbers between 0 and 1, for example 0.5, 0.25')
+            return {'CANCELLED'}
+        # scripted calls never go through check, the extension still has to
+        # follow the format and compression
+        self.filepath = replace_extension(self.filepath, self.format, self.compression)
+        export_b3d(self, self.filepath, self.format, self.all_actions,
+                   self.use_cache, self.invalidate_cache, self.cache_size * 1024 * 1024, self.log_path,
+                   self.compression_level,
+                   self.position_tolerance if self.reduce_keyframes else 0.,
+                   self.angle_tolerance if self.reduce_keyframes else 0.,
+                   self.optimize_vertex_cache, lod_ratios, self.write_index)
+        return {'FINISHED'}
+    
+    def check(self, context):
+        # keep the extension in sync with the format and compression
+        if not os.path.basename(self.filepath):
+            return False
+        filepath = replace_extension(self.filepath, self.format, self.compression)
+        if filepath != self.filepath:
+            self.filepath = filepath
+            return True
+        return False
+    
+    def invoke(self, context, event):
+        if not bpy.context.object:
+            self.report({'ERROR'}, 'No active object to export')
+            return {'CANCELLED'}
+        elif bpy.context.object.type != 'MESH':
+            self.report({'ERROR'}, 'Only mesh objects can be exported')
+            return {'CANCELLED'}
+        else:
+            object_name = bpy.context.object.name
+            object_base = os.path.splitext(object_name)[0]
+            dirpath = together_models + object_base
+            if not os.path.exists(dirpath):
+                os.makedirs(dirpath)
+            self.filepath = dirpath + "/_Idle.b3d"
+            context.window_manager.fileselect_add(self)
+            return {'RUNNING_MODAL'}
@@ -0,0 +1,129 @@
+# vertex cache optimization of the triangle and vertex order
+#
+# triangles are reordered with Tom Forsyth's linear-speed vertex cache
+# optimization: vertices are scored on their position in a simulated LRU
+# cache and on how many of their triangles are left, and the triangle
+# with the best total score among those touching the cache is emitted
+# next. vertices are then renumbered in first use order so the vertex
+# fetches walk memory forward. ACMR (average cache miss ratio, vertices
+# transformed per triangle) is measured with a FIFO cache like the one of
+# most GPUs
+
+cache_size = 32
+
+cache_decay_power = 1.5
+last_triangle_score = 0.75
+valence_boost_scale = 2.
+valence_boost_power = -0.5
+
+def acmr(triangles, size=cache_size):
+    num_triangles = len(triangles) // 3
+    if num_triangles == 0:
+        return 0.
+    cache = []
+    cached = set()
+    misses = 0
+    for vertex in triangles:
+        if vertex not in cached:
+            misses += 1
+            cache.append(vertex)
+            cached.add(vertex)
+            if len(cache) > size:
+                cached.discard(cache.pop(0))
+    return misses / num_triangles
+
+def vertex_score(position, remaining, size):
+    if remaining == 0:
+        return -1.
+    if position < 0:
+        score = 0.
+    elif position < 3:
+        # the vertices of the last triangle are scored the same so the
+        # order they were used in does not matter
+        score = last_triangle_score
+    else:
+        score = (1. - (position - 3) / (size - 3)) ** cache_decay_power
+    return score + valence_boost_scale * remaining ** valence_boost_power
+
+def optimize_triangle_order(triangles, num_vertices, size=cache_size):
+    num_triangles = len(triangles) // 3
+    vertex_triangles = [[] for n in range(num_vertices)]
+    for t in range(num_triangles):
+        for vertex in triangles[t * 3:t * 3 + 3]:
+            vertex_triangles[vertex].append(t)
+    remaining = [len(tris) for tris in vertex_triangles]
+    scores = [vertex_score(-1, remaining[v], size) for v in range(num_vertices)]
+    triangle_scores = [scores[triangles[t * 3]] + scores[triangles[t * 3 + 1]] + scores[triangles[t * 3 + 2]]
+                       for t in range(num_triangles)]
+    emitted = [False] * num_triangles
+    order = []
+    cache = []
+    cursor = 0
+    best = max(range(num_triangles), key=triangle_scores.__getitem__) if num_triangles else -1
+    while best >= 0:
+        emitted[best] = True
+        order.append(best)
+        corners = triangles[best * 3:best * 3 + 3]
+        for vertex in corners:
+            remaining[vertex] -= 1
+            vertex_triangles[vertex].remove(best)
+        # move the corners to the front of the cache, the cache is allowed to
+        # grow by 3 so the vertices pushed out still get their score updated
+        cache = corners + [vertex for vertex in cache if vertex not in corners]
+        evicted = cache[size:]
+        del cache[size:]
+        touched = set()
+        for position, vertex in enumerate(cache):
+            scores[vertex] = vertex_score(position, remaining[vertex], size)
+            touched.update(vertex_triangles[vertex])
+        for vertex in evicted:
+            scores[vertex] = vertex_score(-1, remaining[vertex], size)
+            touched.update(vertex_triangles[vertex])
+        best = -1
+        best_score = -1.
+        for t in touched:
+            score = scores[triangles[t * 3]] + scores[triangles[t * 3 + 1]] + scores[triangles[t * 3 + 2]]
+            triangle_scores[t] = score
+            if score > best_score:
+                best = t
+                best_score = score
+        if best < 0:
+            # nothing left around the cache, continue with the next triangle
+            # in the original order
+            while cursor < num_triangles and emitted[cursor]:
+                cursor += 1
+            best = cursor if cursor < num_triangles else -1
+    return order
+
+def optimize_model(model, size=cache_size):
+    # reorders the triangles and renumbers the vertices of the model in
+    # place and returns the ACMR before and after
+    triangles = list(model.triangles)
+    before = acmr(triangles, size)
+    num_vertices = model.num_vertices
+    order = optimize_triangle_order(triangles, num_vertices, size)
+    triangles = [vertex for t in order for vertex in triangles[t * 3:t * 3 + 3]]
+    triangle_materials = model.triangle_materials
+    uvs = model.uvs
+    model.triangle_materials = [triangle_materials[t] for t in order]
+    model.uvs = [value for t in order for value in uvs[t * 6:t * 6 + 6]]
+
+    # vertices in first use order, unused vertices last
+    remap = [-1] * num_vertices
+    vertex_order = []
+    for vertex in triangles:
+        if remap[vertex] < 0:
+            remap[vertex] = len(vertex_order)
+            vertex_order.append(vertex)
+    for vertex in range(num_vertices):
+        if remap[vertex] < 0:
+            remap[vertex] = len(vertex_order)
+            vertex_order.append(vertex)
+    positions = model.positions
+    normals = model.normals
+    vertex_bones = model.vertex_bones
+    model.positions = [value for v in vertex_order for value in positions[v * 3:v * 3 + 3]]
+    model.normals = [value for v in vertex_order for value in normals[v * 3:v * 3 + 3]]
+    model.vertex_bones = [vertex_bones[v] for v in vertex_order]
+    model.triangles = [remap[vertex] for vertex in triangles]
+    return before, acmr(model.triangles, size)
@@ -0,0 +1,272 @@
+# parallel parsing of large text .b3d files
+#
+# the spawned workers import this module under plain Python, so it must
+# not depend on bpy
+#
+# the section boundaries come from the index trailer or from a scan for
+# the section headers. VERTICES and TRIANGLES are cut into byte ranges of
+# whole lines and the keyframe runs of the tracks are located by walking
+# their count lines, then the ranges are parsed by a concurrent.futures
+# process pool while this process reads the small sections. the values
+# are the ones the serial parser gives, a range the bulk conversion does
+# not understand makes the whole file fall back to the serial parser, as
+# do files under the size threshold and compressed files
+
+import os
+import mmap
+import multiprocessing
+import concurrent.futures
+
+from array import array
+
+from io_scene_b3d.model_b3d import (
+    B3DAnimation,
+    B3DTrack,
+    column_converters,
+    column_typecodes,
+    interleave,
+    )
+from io_scene_b3d.parse_b3d import (
+    load_b3d,
+    parse_line,
+    read_b3d,
+    read_index,
+    split_tokens,
+    )
+from io_scene_b3d.write_b3d import (
+    section_names,
+    )
+from io_scene_b3d.compress_b3d import (
+    file_compression,
+    open_b3d,
+    )
+
+# starting the spawned workers costs more than parsing small files, a few
+# megabytes parse faster serially
+parallel_threshold = 64 * 1024 * 1024
+chunk_size = 4 * 1024 * 1024
+
+def scan_index(data):
+    # same as the index trailer, sections are found in order by their
+    # header line, the animations may be missing
+    starts = []
+    position = 0
+    for name in section_names:
+        header = name.encode("ascii") + b"\n"
+        if position == 0 and data[:len(header)] == header:
+            found = 0
+        else:
+            found = data.find(b"\n" + header, position)
+            if found < 0:
+                if name == "ANIMATIONS":
+                    break
+                return None
+            found += 1
+        starts.append((name, found))
+        position = found + len(header)
+    ends = [start for name, start in starts[1:]] + [len(data)]
+    return {name: (start, end - start) for (name, start), end in zip(starts, ends)}
+
+def line_end(data, position):
+    # mmap has find but no index
+    end = data.find(b"\n", position)
+    if end < 0:
+        raise ValueError("Unexpected end of file")
+    return end
+
+def read_line(data, position):
+    end = line_end(data, position)
+    return data[position:end].decode("utf-8"), end + 1
+
+def skip_lines(data, position, count):
+    find = data.find
+    for n in range(count):
+        position = find(b"\n", position) + 1
+        if position == 0:
+            raise ValueError("Unexpected end of file")
+    return position
+
+def section_rows(data, index, name):
+    # count and byte range of the rows of a count-prefixed section
+    offset, size = index[name]
+    header, position = read_line(data, offset)
+    count_line, start = read_line(data, position)
+    count = parse_line(count_line)
+    end = offset + size
+    # leave out the blank lines before the next section
+    while end > start and data[end - 2:end] == b"\n\n":
+        end -= 1
+    return count, start, end
+
+def split_rows(data, start, end):
+    ranges = []
+    while end - start > chunk_size:
+        split = line_end(data, start + chunk_size) + 1
+        if split >= end:
+            break
+        ranges.append((start, split))
+        start = split
+    ranges.append((start, end))
+    return ranges
+
+def parse_ranges(b3d, ranges, kinds, flat=False):
+    # runs in a worker, returns per range the row count and the columns, or
+    # a flat array when flat. None when the fast conversion does not apply
+    width = len(kinds)
+    results = []
+    with open(b3d, "rb") as file:
+        for start, end in ranges:
+            file.seek(start)
+            lines = file.read(end - start).decode("utf-8").split("\n")
+            # the range ends with a newline
+            lines.pop()
+            tokens = split_tokens(lines, width)
+            if tokens is None:
+                return None
+            try:
+                if flat:
+                    results.append((len(lines), array('d', map(float, tokens))))
+                else:
+                    results.append((len(lines), [array(column_typecodes[kind], map(column_converters[kind], tokens[k::width]))
+                                                 for k, kind in enumerate(kinds)]))
+            except (ValueError, OverflowError):
+                return None
+    return results
+
+def gather_columns(futures, count, kinds):
+    width = len(kinds)
+    columns = [None] * width
+    rows = 0
+    for future in futures:
+        results = future.result()
+        if results is None:
+            return None
+        for num_rows, parsed in results:
+            rows += num_rows
+            for k in range(width):
+                if columns[k] is None:
+                    columns[k] = parsed[k]
+                else:
+                    columns[k].extend(parsed[k])
+    if rows != count:
+        return None
+    return [array(column_typecodes[kind]) if column is None else column for column, kind in zip(columns, kinds)]
+
+def walk_tracks(data, position, num_animations, num_bones):
+    # names and keyframe runs (count, start, end) of every track, the keys
+    # themselves are not parsed
+    animations = []
+    for n in range(num_animations):
+        line, position = read_line(data, position)
+        animation_name = parse_line(line)
+        tracks = []
+        for i in range(num_bones):
+            line, position = read_line(data, position)
+            bone_name = parse_line(line)
+            runs = []
+            for k in range(2):
+                line, position = read_line(data, position)
+                count = parse_line(line)
+                start = position
+                position = skip_lines(data, position, count)
+                runs.append((count, start, position))
+            tracks.append((bone_name, runs))
+        animations.append((animation_name, tracks))
+    return animations
+
+def parse_parallel(b3d, workers=None):
+    with open(b3d, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        index = read_index(b3d) or scan_index(data)
+        if index is None:
+            return None
+        num_vertices, vertices_start, vertices_end = section_rows(data, index, "VERTICES")
+        num_triangles, triangles_start, triangles_end = section_rows(data, index, "TRIANGLES")
+        animations = []
+        if "ANIMATIONS" in index:
+            num_bones = section_rows(data, index, "BONES")[0]
+            num_animations, animations_start = section_rows(data, index, "ANIMATIONS")[:2]
+            animations = walk_tracks(data, animations_start, num_animations, num_bones)
+        vertex_ranges = split_rows(data, vertices_start, vertices_end) if num_vertices else []
+        triangle_ranges = split_rows(data, triangles_start, triangles_end) if num_triangles else []
+    finally:
+        data.close()
+
+    # keyframe runs grouped into tasks of about chunk_size bytes
+    key_tasks = []
+    task = []
+    task_size = 0
+    for animation_name, tracks in animations:
+        for bone_name, runs in tracks:
+            for count, start, end in runs:
+                if count:
+                    task.append((start, end))
+                    task_size += end - start
+                    if task_size >= chunk_size:
+                        key_tasks.append(task)
+                        task = []
+                        task_size = 0
+    if task:
+        key_tasks.append(task)
+
+    # spawned workers do not inherit the state of the host, bpy included
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers,
+                                                mp_context=multiprocessing.get_context("spawn")) as executor:
+        vertex_futures = [executor.submit(parse_ranges, b3d, [r], "ffffffi") for r in vertex_ranges]
+        triangle_futures = [executor.submit(parse_ranges, b3d, [r], "iiiiffffff") for r in triangle_ranges]
+        key_futures = [executor.submit(parse_ranges, b3d, ranges, "ffff", True) for ranges in key_tasks]
+
+        # the small sections are read here meanwhile
+        with open_b3d(b3d, "r") as file:
+            model = read_b3d(file, sections={"MATERIALS", "BONES"}, index=index)
+
+        vertex_columns = gather_columns(vertex_futures, num_vertices, "ffffffi")
+        triangle_columns = gather_columns(triangle_futures, num_triangles, "iiiiffffff")
+        if vertex_columns is None or triangle_columns is None:
+            return None
+        keys = []
+        for future in key_futures:
+            results = future.result()
+            if results is None:
+                return None
+            keys.extend(results)
+
+    x, y, z, nx, ny, nz, bone = vertex_columns
+    model.positions = interleave(x, y, z)
+    model.normals = interleave(nx, ny, nz)
+    model.vertex_bones = bone
+    v1, v2, v3, mat, u1, w1, u2, w2, u3, w3 = triangle_columns
+    model.triangles = interleave(v1, v2, v3)
+    model.triangle_materials = mat
+    model.uvs = interleave(u1, w1, u2, w2, u3, w3)
+
+    results = iter(keys)
+    def run_keys(count):
+        if count == 0:
+            return []
+        num_rows, values = next(results)
+        if num_rows != count:
+            raise ValueError("Expected %i keyframes, found %i" % (count, num_rows))
+        return values
+    for animation_name, tracks in animations:
+        animation = B3DAnimation(animation_name)
+        for bone_name, (locations, rotations) in tracks:
+            animation.tracks.append(B3DTrack(bone_name, run_keys(locations[0]), run_keys(rotations[0])))
+        model.animations.append(animation)
+    return model
+
+def load_b3d_parallel(b3d, workers=None, threshold=parallel_threshold):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1 or file_compression(b3d) != 'NONE' or os.path.getsize(b3d) < threshold:
+        return load_b3d(b3d)
+    try:
+        model = parse_parallel(b3d, workers)
+    except Exception:
+        # anything unexpected, in this process or in a worker, gets the
+        # errors of the serial parser
+        model = None
+    if model is None:
+        return load_b3d(b3d)
+    return model
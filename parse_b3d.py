@@ -0,0 +1,329 @@
+# reader for the text .b3d format
+#
+# this module has no bpy dependency so it can be used and benchmarked from
+# plain CPython, for example
+#   python -m io_scene_b3d.parse_b3d --check model/_Idle.b3d
+#
+# lines are tokenized with a purpose-built number / quoted string splitter
+# instead of ast.literal_eval and count-prefixed blocks are converted column
+# by column in one bulk pass. anything the fast path does not understand
+# falls back to ast.literal_eval so values and errors stay the same
+
+import os
+import re
+import sys
+import ast
+import datetime
+
+from array import array
+
+from io_scene_b3d.model_b3d import (
+    B3DAnimation,
+    B3DModel,
+    B3DTrack,
+    column_converters,
+    column_typecodes,
+    compare_models,
+    interleave,
+    )
+from io_scene_b3d.compress_b3d import (
+    file_compression,
+    open_b3d,
+    )
+from io_scene_b3d.write_b3d import (
+    index_trailer_size,
+    )
+
+# a quoted string without escapes or a bare number followed by a comma or
+# the end of the line
+_field = re.compile(r'[ \t]*(?:"([^"\\\n]*)"|([^,"\\\s][^,"\\]*?))[ \t]*(?:,|$)')
+
+# rows converted at a time, bounds the memory taken by the tokens
+_block_rows = 16384
+
+def parse_number(token):
+    # float() accepts inf and nan which are not python literals
+    if not token or (not token[-1].isdigit() and token[-1] != '.'):
+        raise ValueError(token)
+    try:
+        return int(token)
+    except ValueError:
+        return float(token)
+
+def tokenize(line):
+    line = line.strip()
+    if not line:
+        raise ValueError(line)
+    values = []
+    if '"' not in line:
+        tokens = line.split(",")
+        if len(tokens) > 1 and not tokens[-1].strip():
+            tokens.pop()
+        for token in tokens:
+            values.append(parse_number(token.strip()))
+    else:
+        pos = 0
+        end = len(line)
+        while pos < end:
+            match = _field.match(line, pos)
+            if match is None or match.end() == pos:
+                raise ValueError(line)
+            string, number = match.groups()
+            values.append(string if string is not None else parse_number(number))
+            pos = match.end()
+    return values, line.endswith(",")
+
+def parse_line(line):
+    try:
+        values, trailing = tokenize(line)
+    except ValueError:
+        return ast.literal_eval(line)
+    if len(values) == 1 and not trailing:
+        return values[0]
+    else:
+        return tuple(values)
+
+def split_tokens(lines, width):
+    # tokens of a block of rows for the bulk conversion, None when it does
+    # not apply: a row without exactly width fields, or a token float()
+    # takes but literal_eval rejects (nan, inf). lines may be str or bytes
+    if not lines:
+        return []
+    if isinstance(lines[0], bytes):
+        comma, lower, upper = b",", b"n", b"N"
+    else:
+        comma, lower, upper = ",", "n", "N"
+    text = comma.join(lines)
+    if lower in text or upper in text:
+        return None
+    commas = width - 1
+    for line in lines:
+        if line.count(comma) != commas:
+            return None
+    return text.split(comma)
+
+def read_index(b3d):
+    # {section: (offset, size)} from the index trailer, None when the file
+    # has none. compressed files cannot seek so their index is not used
+    if file_compression(b3d) != 'NONE':
+        return None
+    with open(b3d, "rb") as file:
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        if end < index_trailer_size:
+            return None
+        file.seek(end - index_trailer_size)
+        trailer = file.read()
+        if not trailer.startswith(b"B3DINDEX ") or not trailer.endswith(b"\n"):
+            return None
+        try:
+            offset = int(trailer[9:-1])
+        except ValueError:
+            return None
+        if not 0 <= offset < end:
+            return None
+        file.seek(offset)
+        lines = file.read(end - index_trailer_size - offset).decode("utf-8").split("\n")
+    lines = [line for line in lines if line.strip()]
+    if not lines or lines[0].strip() != "INDEX":
+        return None
+    index = {}
+    for line in lines[2:2 + int(lines[1])]:
+        name, offset, size = parse_line(line)
+        index[name] = (offset, size)
+    return index
+
+def read_b3d(file, fast=True, sections=None, index=None):
+    # sections is a set of section names to load, the others are skipped
+    # with a seek when there is an index or by reading their lines without
+    # parsing them. the object is always loaded
+    def rline():
+        return file.readline()
+
+    if fast:
+        def rliteral():
+            return parse_line(file.readline())
+    else:
+        def rliteral():
+            return ast.literal_eval(file.readline())
+
+    def rsection(name, optional=False):
+        line = rline()
+        while line and not line.strip():
+            line = rline()
+        if optional and line == "":
+            return 0
+        if line.strip() != name:
+            raise ValueError("Expected %s section, found %r" % (name, line))
+        if name == "OBJECT":
+            return None
+        return rliteral()
+
+    def rrows(count, width):
+        rows = [rliteral() for n in range(count)]
+        for row in rows:
+            if not isinstance(row, tuple) or len(row) != width:
+                raise ValueError("Expected %i values, found %r" % (width, row))
+        return rows
+
+    def rblocks(count, width):
+        # fast path rows in blocks, each as its lines and their tokens or
+        # None when the bulk split does not apply
+        for first in range(0, count, _block_rows):
+            lines = [file.readline() for n in range(min(_block_rows, count - first))]
+            yield lines, split_tokens(lines, width)
+
+    def rslow(lines, width):
+        # slow path gives the exact same values and errors as literal_eval
+        rows = [parse_line(line) for line in lines]
+        for row in rows:
+            if not isinstance(row, tuple) or len(row) != width:
+                raise ValueError("Expected %i values, found %r" % (width, row))
+        return rows
+
+    def rcolumns(count, kinds):
+        width = len(kinds)
+        columns = [array(column_typecodes[kind]) for kind in kinds]
+        if fast:
+            for lines, tokens in rblocks(count, width):
+                if tokens is not None:
+                    try:
+                        converted = [array(column_typecodes[kind], map(column_converters[kind], tokens[k::width]))
+                                     for k, kind in enumerate(kinds)]
+                    except (ValueError, OverflowError):
+                        converted = None
+                    if converted is not None:
+                        for column, values in zip(columns, converted):
+                            column.extend(values)
+                        continue
+                for column, values in zip(columns, zip(*rslow(lines, width))):
+                    column.extend(values)
+        else:
+            for column, values in zip(columns, zip(*rrows(count, width))):
+                column.extend(values)
+        return columns
+
+    def rflat(count, width):
+        keys = array('d')
+        if fast:
+            for lines, tokens in rblocks(count, width):
+                if tokens is not None:
+                    try:
+                        keys.extend(array('d', map(float, tokens)))
+                        continue
+                    except (ValueError, OverflowError):
+                        pass
+                keys.extend([value for row in rslow(lines, width) for value in row])
+        else:
+            keys.extend([value for row in rrows(count, width) for value in row])
+        return keys
+
+    def wanted(name):
+        return sections is None or name in sections
+
+    def rskip(name, count):
+        if index is not None and name in index:
+            # text files opened in utf-8 seek to byte offsets
+            offset, size = index[name]
+            file.seek(offset + size)
+        else:
+            for n in range(count):
+                file.readline()
+
+    # object
+    rsection("OBJECT")
+    info = rliteral()
+    model = B3DModel(info[0])
+    model.fps = info[1]
+    model.frame_start = info[2]
+    model.frame_end = info[3]
+    model.frame_current = info[4]
+
+    # vertices
+    num_vertices = rsection("VERTICES")
+    if wanted("VERTICES"):
+        x, y, z, nx, ny, nz, bone = rcolumns(num_vertices, "ffffffi")
+        model.positions = interleave(x, y, z)
+        model.normals = interleave(nx, ny, nz)
+        model.vertex_bones = bone
+    else:
+        rskip("VERTICES", num_vertices)
+
+    # triangles
+    num_triangles = rsection("TRIANGLES")
+    if wanted("TRIANGLES"):
+        v1, v2, v3, mat, u1, w1, u2, w2, u3, w3 = rcolumns(num_triangles, "iiiiffffff")
+        model.triangles = interleave(v1, v2, v3)
+        model.triangle_materials = mat
+        model.uvs = interleave(u1, w1, u2, w2, u3, w3)
+    else:
+        rskip("TRIANGLES", num_triangles)
+
+    # materials
+    num_materials = rsection("MATERIALS")
+    if wanted("MATERIALS"):
+        for n in range(num_materials):
+            mat_info = rliteral()
+            model.materials.append((mat_info[0], mat_info[1]))
+    else:
+        rskip("MATERIALS", num_materials)
+
+    # bones
+    num_bones = rsection("BONES")
+    if wanted("BONES"):
+        for n in range(num_bones):
+            bone_info = rliteral()
+            model.bone_names.append(bone_info[0])
+            model.bone_parents.append(bone_info[1])
+            model.bone_transforms.extend(bone_info[2:9])
+    else:
+        rskip("BONES", num_bones)
+
+    # animations
+    if not wanted("ANIMATIONS"):
+        return model
+    num_animations = rsection("ANIMATIONS", optional=True)
+    for n in range(num_animations):
+        animation = B3DAnimation(rliteral())
+        for i in range(num_bones):
+            track = B3DTrack(rliteral())
+            num_locations = rliteral()
+            track.locations = rflat(num_locations, 4)
+            num_rotations = rliteral()
+            track.rotations = rflat(num_rotations, 4)
+            animation.tracks.append(track)
+        model.animations.append(animation)
+
+    return model
+
+def load_b3d(b3d, fast=True, sections=None):
+    index = None if sections is None else read_index(b3d)
+    with open_b3d(b3d, "r") as file:
+        return read_b3d(file, fast=fast, sections=sections, index=index)
+
+def main(argv):
+    check = "--check" in argv
+    paths = [arg for arg in argv if arg != "--check"]
+    if not paths:
+        print("usage: python -m io_scene_b3d.parse_b3d [--check] file.b3d ...")
+        return 2
+    status = 0
+    for path in paths:
+        size = os.path.getsize(path)
+        start_time = datetime.datetime.now()
+        model = load_b3d(path)
+        elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+        print("Parsed", path, "in", elapsed_time, "(%.1f MB/s)" % (size / 1e6 / max(elapsed_time, 1e-9)))
+        if check:
+            start_time = datetime.datetime.now()
+            reference = load_b3d(path, fast=False)
+            elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+            print("Parsed", path, "with literal_eval in", elapsed_time)
+            mismatch = compare_models(model, reference)
+            if mismatch is not None:
+                print("Mismatch in", mismatch)
+                status = 1
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,69 @@
+# keyframe reduction of animation tracks
+#
+# keys are flat time, x, y, z columns as in B3DTrack. a track is simplified
+# with Ramer-Douglas-Peucker over time: the key furthest from the straight
+# line between the two keys kept around it is kept when its error is over
+# the tolerance, otherwise every key between them is dropped. so every
+# dropped key can be rebuilt by linear interpolation within the tolerance
+#
+# the runtime is expected to interpolate linearly between keys, import_b3d
+# sets LINEAR interpolation on the keyframes it creates so Blender plays
+# them the same way. the bezier handles of keys authored in Blender are not
+# exported, only the keys themselves
+#
+# locations are measured by euclidean distance, euler rotations by the
+# largest difference of any of the three angles
+
+import math
+
+def position_error(x, y, z, ex, ey, ez):
+    return math.sqrt((x - ex) ** 2 + (y - ey) ** 2 + (z - ez) ** 2)
+
+def angle_error(x, y, z, ex, ey, ez):
+    return max(abs(x - ex), abs(y - ey), abs(z - ez))
+
+def sort_keys(keys):
+    rows = sorted(zip(keys[0::4], keys[1::4], keys[2::4], keys[3::4]))
+    return [value for row in rows for value in row]
+
+def reduce_keys(keys, tolerance, error=position_error):
+    # keys must be sorted by time, the first and last keys are always kept
+    count = len(keys) // 4
+    if count <= 2 or tolerance <= 0.:
+        return keys
+    times = keys[0::4]
+    xs = keys[1::4]
+    ys = keys[2::4]
+    zs = keys[3::4]
+    keep = [False] * count
+    keep[0] = keep[-1] = True
+    # explicit stack instead of recursion, baked tracks have thousands of keys
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        t0 = times[first]
+        duration = times[last] - t0
+        x0, y0, z0 = xs[first], ys[first], zs[first]
+        dx, dy, dz = xs[last] - x0, ys[last] - y0, zs[last] - z0
+        worst = -1.
+        worst_index = first
+        for k in range(first + 1, last):
+            f = (times[k] - t0) / duration if duration else 0.
+            e = error(xs[k], ys[k], zs[k], x0 + dx * f, y0 + dy * f, z0 + dz * f)
+            if e > worst:
+                worst = e
+                worst_index = k
+        if worst > tolerance:
+            keep[worst_index] = True
+            stack.append((first, worst_index))
+            stack.append((worst_index, last))
+    return [value for k in range(count) if keep[k] for value in keys[k * 4:k * 4 + 4]]
+
+def reduce_track(track, position_tolerance=0., angle_tolerance=0.):
+    if position_tolerance > 0.:
+        track.locations = reduce_keys(track.locations, position_tolerance, position_error)
+    if angle_tolerance > 0.:
+        track.rotations = reduce_keys(sort_keys(track.rotations), angle_tolerance, angle_error)
+    return track
@@ -0,0 +1,66 @@
+# per-phase timings and counters of an import or export
+#
+#   stats = Stats("Imported")
+#   with stats.phase("parse"):
+#       ...
+#   stats.count("vertices", num_vertices)
+#   stats.count("rna_calls", 2)
+#   operator.report({'INFO'}, stats.summary())
+#   stats.write_log(log_path)
+#
+# the log is a JSON lines file so successive runs can be compared.
+# rna_calls is counted where the addon touches Blender data: every
+# attribute read or write, method call, len and element of a collection,
+# as fake_b3d counts them, so harness_b3d checks the two agree
+
+import os
+import json
+import datetime
+import contextlib
+
+class Stats:
+    def __init__(self, name, filepath=""):
+        self.name = name
+        self.filepath = filepath
+        self.start_time = datetime.datetime.now()
+        self.phases = {}
+        self.counters = {}
+
+    def __repr__(self):
+        return "Stats(%s)" % self.name
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        start_time = datetime.datetime.now()
+        try:
+            yield
+        finally:
+            elapsed_time = (datetime.datetime.now() - start_time).total_seconds()
+            self.phases[name] = self.phases.get(name, 0.) + elapsed_time
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def elapsed(self):
+        return (datetime.datetime.now() - self.start_time).total_seconds()
+
+    def summary(self):
+        phases = ", ".join("%s %.3fs" % (name, seconds) for name, seconds in self.phases.items())
+        counters = ", ".join("%s %i" % (name, count) for name, count in self.counters.items())
+        return "%s %s in %.3fs (%s) [%s]" % (self.name, os.path.basename(self.filepath), self.elapsed(), phases, counters)
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "file": self.filepath,
+            "time": self.start_time.isoformat(),
+            "elapsed": self.elapsed(),
+            "phases": dict(self.phases),
+            "counters": dict(self.counters),
+            }
+
+    def write_log(self, log_path):
+        if not log_path:
+            return
+        with open(log_path, "a", encoding="utf-8") as file:
+            file.write(json.dumps(self.as_dict()) + "\n")
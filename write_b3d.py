@@ -0,0 +1,145 @@
+# writer for the text .b3d format
+#
+# each section is formatted from flat columns with a single % operation
+# over the whole block, which produces exactly the same bytes as
+# formatting every row on its own
+
+from io_scene_b3d.model_b3d import (
+    interleave,
+    )
+from io_scene_b3d.compress_b3d import (
+    default_level,
+    open_b3d,
+    )
+
+object_format = '"%s", %.3f, %.3f, %.3f, %.3f\n'
+vertex_format = "%.6f, %.6f, %.6f, %.6f, %.6f, %.6f, %i\n"
+triangle_format = "%i, %i, %i, %i, %.6f, %.6f, %.6f, %.6f, %.6f, %.6f\n"
+material_format = '"%s", "%s"\n'
+bone_format = '"%s", "%s", %.6f, %.6f, %.6f, %.6f, %.6f, %.6f, %.3f\n'
+keyframe_format = "%.3f, %.6f, %.6f, %.6f\n"
+
+# optional index trailer with the byte offset and size of every section,
+# older readers stop after the animations and never see it
+#
+#   INDEX
+#   6
+#   "OBJECT", 0, 45
+#   ...
+#   B3DINDEX <byte offset of the INDEX section, 16 digits>
+section_names = ("OBJECT", "VERTICES", "TRIANGLES", "MATERIALS", "BONES", "ANIMATIONS")
+index_format = '"%s", %i, %i\n'
+index_trailer_format = "B3DINDEX %016i\n"
+index_trailer_size = 26
+
+def format_rows(row_format, count, values):
+    return (row_format * count) % tuple(values)
+
+def serialize_object(model):
+    return "OBJECT\n" + object_format % (model.name, model.fps, model.frame_start, model.frame_end, model.frame_current)
+
+def serialize_vertices(model):
+    count = model.num_vertices
+    positions = model.positions
+    normals = model.normals
+    values = interleave(positions[0::3], positions[1::3], positions[2::3],
+                        normals[0::3], normals[1::3], normals[2::3],
+                        model.vertex_bones)
+    return "\nVERTICES\n%i\n" % count + format_rows(vertex_format, count, values)
+
+def serialize_triangles(model):
+    count = model.num_triangles
+    triangles = model.triangles
+    uvs = model.uvs
+    values = interleave(triangles[0::3], triangles[1::3], triangles[2::3],
+                        model.triangle_materials,
+                        uvs[0::6], uvs[1::6], uvs[2::6], uvs[3::6], uvs[4::6], uvs[5::6])
+    return "\nTRIANGLES\n%i\n" % count + format_rows(triangle_format, count, values)
+
+def serialize_materials(model):
+    count = len(model.materials)
+    values = [value for material in model.materials for value in material]
+    return "\nMATERIALS\n%i\n" % count + format_rows(material_format, count, values)
+
+def serialize_bones(model):
+    count = model.num_bones
+    transforms = model.bone_transforms
+    values = interleave(model.bone_names, model.bone_parents,
+                        *[transforms[k::7] for k in range(7)])
+    return "\nBONES\n%i\n" % count + format_rows(bone_format, count, values)
+
+def serialize_track(track):
+    locations = track.locations
+    rotations = track.rotations
+    return ('"%s"\n' % track.bone_name +
+            "%i\n" % (len(locations) // 4) + format_rows(keyframe_format, len(locations) // 4, locations) +
+            "%i\n" % (len(rotations) // 4) + format_rows(keyframe_format, len(rotations) // 4, rotations))
+
+def serialize_animations(model):
+    chunks = ["\nANIMATIONS\n%i\n" % len(model.animations)]
+    if not model.animations:
+        # the exporter has always written empty tracks after a zero count
+        # when there is a skeleton, readers stop at the count
+        for bone_name in model.bone_names:
+            chunks.append('"%s"\n0\n0\n' % bone_name)
+    for animation in model.animations:
+        chunks.append('"%s"\n' % animation.name)
+        for track in animation.tracks:
+            chunks.append(serialize_track(track))
+    return "".join(chunks)
+
+def serialize_static_sections(model):
+    # every section but the animations
+    yield serialize_object(model)
+    yield serialize_vertices(model)
+    yield serialize_triangles(model)
+    yield serialize_materials(model)
+    yield serialize_bones(model)
+
+def serialize_sections(model):
+    yield from serialize_static_sections(model)
+    yield serialize_animations(model)
+
+def serialize_index(encoded_chunks):
+    # sections never span chunks, each starts with its name on its own line
+    entries = []
+    names = list(section_names)
+    position = 0
+    for chunk in encoded_chunks:
+        pos = 0
+        while names:
+            name = names[0].encode("ascii")
+            if position == 0 and pos == 0 and chunk.startswith(name + b"\n"):
+                found = 0
+            else:
+                found = chunk.find(b"\n" + name + b"\n", pos)
+                if found < 0:
+                    break
+                found += 1
+            entries.append([names.pop(0), position + found, 0])
+            pos = found + len(name)
+        position += len(chunk)
+    for entry, next_entry in zip(entries, entries[1:] + [None]):
+        entry[2] = (position if next_entry is None else next_entry[1]) - entry[1]
+    values = [value for entry in entries for value in entry]
+    return ("\nINDEX\n%i\n" % len(entries) + format_rows(index_format, len(entries), values) +
+            index_trailer_format % position)
+
+def encode_chunks(chunks, index=False):
+    encoded = [chunk.encode("utf-8") for chunk in chunks]
+    if index:
+        encoded.append(serialize_index(encoded).encode("utf-8"))
+    return encoded
+
+def write_b3d(file, model):
+    for chunk in serialize_sections(model):
+        file.write(chunk)
+
+def save_b3d(b3d, model, level=default_level, index=False):
+    if index:
+        with open_b3d(b3d, "wb", level) as file:
+            for chunk in encode_chunks(serialize_sections(model), index):
+                file.write(chunk)
+    else:
+        with open_b3d(b3d, "w", level) as file:
+            write_b3d(file, model)